@@ -0,0 +1,173 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Street survey columns and the value used when a cell (or the whole column) is missing
+STREET_NUMERICAL_DEFAULTS = {
+    "Sidewalk?": 1,
+    "Public Restrooms?": 0,
+    "Bumpiness (1-10)": 3,
+    "Sidewalk Width (FT)": 3,
+    "Crosswalks?": 0,
+    "Ratings (1-5)": 3,
+    "Maintenence (1-5)": 3,
+}
+STREET_CATEGORICAL_DEFAULTS = {
+    "Traffic Volume": "MODERATE",
+    "Incline": "MODERATE",
+    "Pos Comment #": "FEW",
+    "Neg Comment #": "FEW",
+}
+STREET_COLUMNS = ["Street Name", "Ramps?"] + list(STREET_NUMERICAL_DEFAULTS) + list(STREET_CATEGORICAL_DEFAULTS)
+BUSINESS_COLUMNS = ["Company Name", "Street Name", "Address", "Accessible Bathrooms?", "Stairs?", "Elevators?",
+                    "Surface Type", "Push door button", "Ramps?", "Ratings (1-5)", "Maintenance (1-5)",
+                    "Pos Comment #", "Neg Comment #"]
+
+# Rows are matched with the previous run by these columns (plus their order among duplicates)
+STREET_KEY = ["Street Name"]
+BUSINESS_KEY = ["Company Name", "Address"]
+
+LEVEL_POINTS = {'LOW': 10, 'MODERATE': 0, 'HIGH': -10}  # Traffic volume and incline
+STREET_POS_COMMENT_POINTS = {'FEW': 5, 'SEVERAL': 10, 'MANY': 15}
+STREET_NEG_COMMENT_POINTS = {'FEW': -5, 'SEVERAL': -10, 'MANY': -15}
+BUSINESS_POS_COMMENT_POINTS = {'FEW': 5, 'SEVERAL': 10, 'MANY': 15, 'PLENTY': 15}
+BUSINESS_NEG_COMMENT_POINTS = {'FEW': -5, 'SEVERAL': -10, 'MANY': -15, 'PLENTY': -15}
+
+STREET_SCORE_COLUMN = "Street Score"  # Business input: the score of the street it is on
+HASH_COLUMN = "input_hash"
+OCCURRENCE_COLUMN = "occurrence"
+
+
+# Converts the raw street sheet into typed columns, filling the defaults above
+def prepare_streets(frame):
+    frame = frame.copy()
+    for column, default in STREET_NUMERICAL_DEFAULTS.items():
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(default)
+        else:
+            frame[column] = default
+            print(f"Warning: {column} not found, defaulting to {default}")
+
+    if 'Ramps?' in frame.columns:
+        frame['Ramps?'] = frame['Ramps?'].astype(str).str.strip().str.upper().isin(['TRUE', '1', 'YES']).astype(int)
+    else:
+        frame['Ramps?'] = 1  # Default to present if missing
+        print("Warning: 'Ramps?' not found, defaulting to 1")
+
+    for column, default in STREET_CATEGORICAL_DEFAULTS.items():
+        if column in frame.columns:
+            frame[column] = frame[column].str.upper().fillna(default)
+        else:
+            frame[column] = default
+            print(f"Warning: {column} not found, defaulting to {default}")
+    return frame
+
+
+# Street scoring rules over whole columns of a prepared street frame
+def score_streets(frame):
+    score = frame['Sidewalk?'] * 50  # Sidewalk present
+    score += frame['Traffic Volume'].map(LEVEL_POINTS).fillna(0)
+    score += frame['Ramps?'] * 20 - 10  # +10 if present, -10 if not
+    score += (frame['Public Restrooms?'] > 0).astype(int) * 20 - 10  # +10 if present, -10 if not
+    score -= frame['Bumpiness (1-10)']
+    width = frame['Sidewalk Width (FT)']
+    score += np.where(width > 8, width / 10, -100)  # Too narrow for a wheelchair below 8 feet
+    score += frame['Incline'].map(LEVEL_POINTS).fillna(0)
+    score += np.minimum(np.trunc(frame['Crosswalks?']) * 2, 30)  # 2 per crosswalk capped at 30
+    score += frame['Ratings (1-5)']
+    score += frame['Maintenence (1-5)']
+    score += frame['Pos Comment #'].map(STREET_POS_COMMENT_POINTS).fillna(5)
+    score += frame['Neg Comment #'].map(STREET_NEG_COMMENT_POINTS).fillna(-5)
+    return score.astype(float)
+
+
+# Adds each business's street score, warning about businesses on unscored streets
+def prepare_businesses(frame, street_scores):
+    frame = frame.copy()
+    for column in BUSINESS_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = ""
+            print(f"Warning: {column} not found, treating it as not specified")
+    scores = frame['Street Name'].map(street_scores)
+    for company, street in frame.loc[scores.isna(), ['Company Name', 'Street Name']].itertuples(index=False):
+        print(f"Warning: Street '{street}' not found in street data for business '{company}'")
+    frame[STREET_SCORE_COLUMN] = scores.fillna(0).astype(float)
+    return frame
+
+
+# Business scoring rules over whole columns of a prepared business frame. Sheet checkboxes
+# arrive as 'TRUE'/'FALSE' strings and anything else counts as not specified.
+def score_businesses(frame):
+    score = frame[STREET_SCORE_COLUMN].copy()
+
+    bathrooms = frame['Accessible Bathrooms?']
+    score += np.select([bathrooms == 'TRUE', bathrooms == 'FALSE'], [10, -20], 0)
+
+    # Stairs with no elevator -50, with an elevator +10, elevator not specified -25
+    stairs = frame['Stairs?'].map(bool)
+    elevators = frame['Elevators?']
+    score += np.where(stairs, np.select([elevators == 'FALSE', elevators == 'TRUE'], [-50, 10], -25), 0)
+
+    score -= (frame['Surface Type'] != 'Flat') * 10
+
+    button = frame['Push door button']
+    score += np.select([button == 'FALSE', button == 'TRUE'], [-20, 5], -10)
+
+    score -= frame['Ramps?'].map(lambda ramps: ramps == False) * 10
+
+    score += pd.to_numeric(frame['Ratings (1-5)'], errors='coerce').fillna(0)
+    score += pd.to_numeric(frame['Maintenance (1-5)'], errors='coerce').fillna(0)
+    score += frame['Pos Comment #'].astype(str).str.upper().map(BUSINESS_POS_COMMENT_POINTS).fillna(0)
+    score += frame['Neg Comment #'].astype(str).str.upper().map(BUSINESS_NEG_COMMENT_POINTS).fillna(0)
+    return score.astype(float)
+
+
+# One uint64 hash per row of the given columns, stable between runs
+def row_hashes(frame, columns):
+    return pd.util.hash_pandas_object(frame[columns].astype(str), index=False).to_numpy(dtype=np.uint64)
+
+
+def _row_keys(frame, key_columns):
+    keys = frame[key_columns].astype(str)
+    keys[OCCURRENCE_COLUMN] = keys.groupby(key_columns).cumcount()
+    return keys
+
+
+# Scores a prepared frame, reusing the previous run's score for every row whose key and input hash
+# are unchanged so only new or edited rows go through score. previous is the frame written by
+# write_results last time, or None for a full run. Returns (scores, hashes, rescored row count).
+def rescore(frame, key_columns, input_columns, score, previous=None):
+    hashes = row_hashes(frame, input_columns)
+    scores = pd.Series(np.nan, index=frame.index, dtype=float)
+    if previous is not None and {HASH_COLUMN, "score", *key_columns} <= set(previous.columns):
+        current = _row_keys(frame, key_columns)
+        current[HASH_COLUMN] = hashes
+        old = _row_keys(previous, key_columns)
+        old[HASH_COLUMN] = previous[HASH_COLUMN].to_numpy(dtype=np.uint64)
+        old["score"] = previous["score"].to_numpy(dtype=float)
+        matched = current.merge(old, on=key_columns + [OCCURRENCE_COLUMN, HASH_COLUMN], how="left")
+        scores[:] = matched["score"].to_numpy()
+
+    changed = scores.isna().to_numpy()
+    if changed.any():
+        scores[changed] = score(frame[changed]).to_numpy()
+    return scores, hashes, int(changed.sum())
+
+
+# The previous run's columnar file as a frame, or None if there is none
+def read_columnar(file_path):
+    if not os.path.exists(file_path):
+        return None
+    with np.load(file_path) as columns:
+        return pd.DataFrame({name: columns[name] for name in columns.files})
+
+
+# Writes the result columns to csv_path as before, and the same rows plus each row's input hash
+# to columnar_path, one array per column in an .npz (text columns as fixed-width unicode)
+def write_results(frame, columns, csv_path, columnar_path):
+    frame[columns].to_csv(csv_path, index=False)
+    arrays = {}
+    for column in columns + [HASH_COLUMN]:
+        values = frame[column].to_numpy()
+        arrays[column] = values.astype(str) if values.dtype == object else values
+    np.savez(columnar_path, **arrays)
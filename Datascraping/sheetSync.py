@@ -0,0 +1,178 @@
+import os
+import csv
+import json
+import time
+import hashlib
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Next to this file, so runs from the repository root and from Datascraping/ share the snapshots
+SNAPSHOT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'sheets')
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# Survey worksheets, by the name their snapshot is stored under
+SheetSpec = namedtuple("SheetSpec", ["key", "worksheet"])
+SHEETS = {
+    "streets": SheetSpec("1idOzW4T52Sr69Eazpn_BMcNQFvLTeBYo4Nj258uFZMU", "Street_Accessibility_Info"),
+    "businesses": SheetSpec("1-t_5-twXtjssF3e1OVUAEs8LscrXC3KiedAuUgqjFPA", "Business_Info"),
+}
+
+
+# Sources return (revision, records) from fetch, where records is what gspread's
+# get_all_records() gives, or None when the revision equals known_revision and the rows were
+# not downloaded. A revision of None means the source can't tell and always downloads.
+class GoogleSheetsSource:
+    def __init__(self, creds_path=None):
+        self.creds_path = creds_path if creds_path is not None else os.getenv("GOOGLE_CREDENTIALS")
+        self.client = None
+
+    # Authorizes on first use, so runs from a snapshot don't need credentials
+    def connect(self):
+        if self.client is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+            if not self.creds_path or not os.path.exists(self.creds_path):
+                raise FileNotFoundError("Please set the GOOGLE_CREDENTIALS environment variable to the path of your credentials.json file.")
+            creds = ServiceAccountCredentials.from_json_keyfile_name(self.creds_path, SCOPE)
+            self.client = gspread.authorize(creds)
+        return self.client
+
+    def fetch(self, spec, known_revision=None):
+        spreadsheet = self.connect().open_by_key(spec.key)
+        # Drive's modified time for the whole spreadsheet; older gspread versions expose it as a property
+        if hasattr(spreadsheet, "get_lastUpdateTime"):
+            revision = spreadsheet.get_lastUpdateTime()
+        else:
+            revision = getattr(spreadsheet, "lastUpdateTime", None)
+        if revision is not None and revision == known_revision:
+            return revision, None
+        return revision, spreadsheet.worksheet(spec.worksheet).get_all_records()
+
+
+# Stand-in for Google Sheets reading <folder>/<worksheet>.csv (a sheet downloaded as CSV), for
+# tests and air-gapped runs. Values are converted the way get_all_records() converts them.
+class LocalSheetsSource:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, spec):
+        return os.path.join(self.folder, spec.worksheet + ".csv")
+
+    def fetch(self, spec, known_revision=None):
+        stat = os.stat(self.path(spec))
+        revision = f"{stat.st_mtime_ns}:{stat.st_size}"
+        if revision == known_revision:
+            return revision, None
+        with open(self.path(spec), 'r', newline='', encoding='utf-8') as file:
+            return revision, [{column: numericise(value) for column, value in row.items()} for row in csv.DictReader(file)]
+
+    # Writes records as <worksheet>.csv, e.g. to seed a folder from a snapshot
+    def write(self, spec, records):
+        os.makedirs(self.folder, exist_ok=True)
+        columns = list(records[0]) if records else []
+        with open(self.path(spec), 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+
+
+# Same as gspread.utils.numericise: ints and floats become numbers, everything else stays text
+def numericise(value):
+    if value is None:
+        return ""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def row_hash(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# The rows of one worksheet as of its last download, with one hash per row
+class SheetSnapshot:
+    def __init__(self, name, revision, records, fetched=None):
+        self.name = name
+        self.revision = revision
+        self.records = records
+        self.hashes = [row_hash(record) for record in records]
+        self.fetched = fetched if fetched is not None else time.time()
+
+    @staticmethod
+    def path(name, folder=SNAPSHOT_FOLDER):
+        return os.path.join(folder, name + ".json")
+
+    @classmethod
+    def load(cls, name, folder=SNAPSHOT_FOLDER):
+        path = cls.path(name, folder)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(name, data["revision"], data["records"], data["fetched"])
+
+    def save(self, folder=SNAPSHOT_FOLDER):
+        os.makedirs(folder, exist_ok=True)
+        path = self.path(self.name, folder)
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({"revision": self.revision, "fetched": self.fetched, "records": self.records}, file)
+        os.replace(path + ".tmp", path)
+
+
+# Rows of the new snapshot that weren't in the old one (new or edited), and how many old rows
+# are gone. Rows are compared by hash, so moving a row in the sheet isn't a change.
+class SheetDelta:
+    def __init__(self, old, new):
+        old_counts = Counter(old.hashes if old is not None else [])
+        new_counts = Counter(new.hashes)
+        seen = Counter()
+        self.changed_rows = []
+        for row, row_hash in enumerate(new.hashes):
+            seen[row_hash] += 1
+            if seen[row_hash] > old_counts[row_hash]:
+                self.changed_rows.append(row)
+        self.removed = sum((old_counts - new_counts).values())
+        self.total = len(new.hashes)
+
+    @property
+    def empty(self):
+        return not self.changed_rows and not self.removed
+
+    def __str__(self):
+        return f"{len(self.changed_rows)} new or changed and {self.removed} removed of {self.total} rows"
+
+
+# Brings the local snapshot of every sheet up to date from source, fetching the sheets
+# concurrently. A sheet that can't be fetched (no credentials, no network) falls back to its
+# last snapshot, or with offline=True nothing is fetched at all.
+# Returns {name: (snapshot, delta since the previous snapshot)}.
+def sync_sheets(source, sheets=SHEETS, folder=SNAPSHOT_FOLDER, offline=False):
+    def sync(name):
+        old = SheetSnapshot.load(name, folder)
+        if offline:
+            if old is None:
+                raise FileNotFoundError(f"No snapshot of {name} in {folder} to run offline from")
+            return old, SheetDelta(old, old)
+        try:
+            revision, records = source.fetch(sheets[name], old.revision if old is not None else None)
+        except Exception as error:
+            if old is None:
+                raise
+            print(f"Warning: could not fetch {name} ({error}), using the snapshot from {time.ctime(old.fetched)}")
+            return old, SheetDelta(old, old)
+        if records is None:
+            return old, SheetDelta(old, old)  # Unchanged since the snapshot, nothing downloaded
+        new = SheetSnapshot(name, revision, records)
+        new.save(folder)
+        return new, SheetDelta(old, new)
+
+    with ThreadPoolExecutor(max_workers=len(sheets)) as pool:
+        results = dict(zip(sheets, pool.map(sync, sheets)))
+    for name, (_, delta) in results.items():
+        print(f"{name}: {delta}")
+    return results
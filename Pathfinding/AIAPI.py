@@ -1,6 +1,10 @@
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
 from openai._exceptions import OpenAIError
 import os
+import threading
+import time
+from concurrent.futures import Future
+from directionsCache import DirectionsCache
 
 # class Business(BaseModel):
 #     name: str
@@ -9,18 +13,12 @@ import os
 # class Response(BaseModel):
 #     business: Business
 
-class AIAPI:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
-
-    # Standard ChatGPT Interaction
-    def getAPIResponse(self, path_text, model="gpt-4o-mini"):
-        # This is where you direct the AI in it's response. (How are we going to get it from ChatGPT)
-        system_message = "You are a helpful navigation assistant."
+# This is where you direct the AI in it's response. (How are we going to get it from ChatGPT)
+SYSTEM_MESSAGE = "You are a helpful navigation assistant."
 
-        # This is the same as the chatbox for ChatGPT. (What are we asking ChatGPT)
-        user_message = f"""
-        You are a navigation assistant. Given a list of grid path steps with row, col, and street name, generate step-by-step human-friendly directions like Google Maps.
+# This is the same as the chatbox for ChatGPT. (What are we asking ChatGPT)
+USER_PROMPT_TEMPLATE = """
+        You are a navigation assistant. Given a route as street segments, one per line with the street name, the turn onto it, its heading, its length in grid cells, the (row, col) where it starts and any streets crossed, generate step-by-step human-friendly directions like Google Maps.
 
         Use patterns like:
         - Continue down [street] for [X] blocks.
@@ -32,31 +30,129 @@ class AIAPI:
         or
         "Feel free to ask if you need any further adjustments"
         
-        Here is the path:
+        Here is the route:
         {path_text}
         """
 
+# Requests currently being sent, by cache key. Identical concurrent requests wait on the same Future.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+# Network settings for the shared client. Retries are done here, with exponential backoff,
+# so a retry never repeats tokens that were already streamed.
+REQUEST_TIMEOUT = 30  # Seconds
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5  # Seconds before the first retry, doubled for each further one
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+# One OpenAI client (and so one HTTP connection pool) per process. OPENAI_BASE_URL can point
+# it at a local fake server for testing.
+def shared_client():
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = OpenAI(api_key=os.environ['OPENAI_API_KEY'], timeout=REQUEST_TIMEOUT, max_retries=0)
+        return _shared_client
+
+
+# client: anything with chat.completions.create (e.g. a local stub), defaults to the shared client.
+# offline: only serve from the cache, never call the API. Also enabled by NAVIGATION_OFFLINE=1.
+class AIAPI:
+    def __init__(self, client=None, cache=None, offline=None):
+        self.offline = offline if offline is not None else os.environ.get('NAVIGATION_OFFLINE') == '1'
+        self.cache = cache if cache is not None else DirectionsCache()
+        self.client = client
+        if self.client is None and not self.offline:
+            self.client = shared_client()
+
+    # Standard ChatGPT Interaction, served from the directions cache when possible.
+    # With on_token the response is streamed, calling on_token(text) per chunk (a cached or
+    # shared response arrives as one chunk). should_stop is polled between chunks.
+    def getAPIResponse(self, path_text, model="gpt-4o-mini", on_token=None, should_stop=None):
+        key = DirectionsCache.key(model, SYSTEM_MESSAGE, USER_PROMPT_TEMPLATE, path_text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+        if self.offline:
+            print("Offline mode: no cached directions for this path")
+            return None
+
+        with _in_flight_lock:
+            pending = _in_flight.get(key)
+            is_owner = pending is None
+            if is_owner:
+                pending = _in_flight[key] = Future()
+        if not is_owner:
+            response = pending.result()  # Share the identical request already in flight
+            if response is not None and on_token is not None:
+                on_token(response)
+            return response
+
+        response = None
+        try:
+            response = self.requestCompletion(path_text, model, on_token, should_stop)
+            if response is not None:
+                self.cache.put(key, response, model)
+        finally:
+            with _in_flight_lock:
+                del _in_flight[key]
+            pending.set_result(response)
+        return response
+
+    def requestCompletion(self, path_text, model, on_token=None, should_stop=None):
         messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": USER_PROMPT_TEMPLATE.format(path_text=path_text)}
         ]
 
-        try:
-            completion = self.client.chat.completions.create(
-                model=model,
-                messages=messages
-            )
+        for attempt in range(MAX_ATTEMPTS):
+            streamed = []
+            try:
+                if on_token is None:
+                    completion = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages
+                    )
+                    return completion.choices[0].message.content
 
-            return completion.choices[0].message.content
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True
+                )
+                for chunk in stream:
+                    if should_stop is not None and should_stop():
+                        stream.close()
+                        return None
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        streamed.append(text)
+                        on_token(text)
+                return "".join(streamed)
 
-        except OpenAIError as e:
-        # Handle specific OpenAI errors
-            print(f"OpenAI API error: {e}")
-            return None
-        except Exception as e:
-            # Handle other potential errors
-            print(f"An unexpected error occurred: {e}")
-            return None
+            except RETRYABLE_ERRORS as e:
+                # Only retry if nothing reached the caller yet
+                if streamed or attempt == MAX_ATTEMPTS - 1:
+                    print(f"OpenAI API error: {e}")
+                    return None
+                delay = BACKOFF_BASE * 2 ** attempt
+                print(f"OpenAI API error: {e}, retrying in {delay}s")
+                time.sleep(delay)
+            except OpenAIError as e:
+            # Handle specific OpenAI errors
+                print(f"OpenAI API error: {e}")
+                return None
+            except Exception as e:
+                # Handle other potential errors
+                print(f"An unexpected error occurred: {e}")
+                return None
 
     # Custom Object ChatGPT Response
     # def getCustomAPIResponse(self, model = "gpt-4o-mini"):
@@ -1,13 +1,27 @@
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-from queue import PriorityQueue
-from gridNode import Node
+import argparse
+import time
+import numpy as np
+from gridNode import Node, shared_brush
 from colorPicker import ColorPicker
 from businessPicker import BusinessPicker
+from streetPicker import StreetPicker
 from gridFileManager import GridFileManager
 from gridView import GridView
-from AIAPI import AIAPI
+from routingGrid import CELL_TYPES, TYPE_CODES, RoutingGrid
+from gridRaster import RasterGrid
+from pathWorker import PathWorker
+from directionsWorker import DirectionsWorker
+from routeCache import RouteCache
+from routeDirections import compress_route, describe_route, segments_text
+from searchVisualizer import SearchVisualizer, EXECUTION_MODES
+from searchEngines import SEARCH_ENGINES
+from runStats import RunStats
+from costProfiles import COST_PROFILES, MANUAL_PROFILE, CostProfiles, load_street_scores
+from streetIndex import StreetIndex
+from businessIndex import BusinessIndex
 
 # Window and grid configuration
 WINDOW_WIDTH = 900
@@ -16,6 +30,8 @@ ROWS, COLS = 160, 320
 GRID_WIDTH = int(WINDOW_WIDTH * 2 / 3)
 GRID_HEIGHT = int(WINDOW_HEIGHT * 2 / 3)
 CELL_SIZE = 10
+ROUTE_CACHE_SIZE = 128  # Routes kept by the route cache
+RENDERERS = ["items", "raster"]
 
 # Color mapping for cell types
 color_map = {
@@ -33,7 +49,7 @@ color_map = {
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, renderer="items", profile_runs=False):
         super().__init__()
 
         self.setWindowTitle("PyQt5 Grid with Pathfinding")
@@ -42,13 +58,48 @@ class MainWindow(QMainWindow):
         self.selected_name = ""
         self.selected_cost = ""
         self.color_map = color_map
+        self.renderer = renderer  # One of RENDERERS
         self.start = None
         self.goals = []
         self.businesses = []
         self.business_dict = { name: (x, y, score) for name, x, y, score in self.businesses }
+        self.business_index = BusinessIndex(self.businesses)  # Nearest, radius and viewport queries
         self.savedGridsPath = 'Pathfinding/Grids/'
         self.isLeftClicking = False
-        self.stop_requested = False
+        self.execution_mode = "animate"  # See searchVisualizer.EXECUTION_MODES
+        self.polish_directions = True  # Send local directions through OpenAI for wording
+        self.optimize_order = False  # Visit goals in the cheapest order instead of click order
+        self.search_engine = "astar"  # See searchEngines.SEARCH_ENGINES
+        self.profile_runs = profile_runs  # Run searches under cProfile and tracemalloc
+        self.visualizer = None
+        self.run_stats = None  # RunStats of the latest route request
+
+        # Background search thread, only the latest request (route_job_id) is shown
+        self.path_worker = PathWorker()
+        self.path_worker.frontier.connect(self.on_route_frontier)
+        self.path_worker.routeFound.connect(self.on_route_found)
+        self.path_worker.routeFailed.connect(self.on_route_failed)
+        self.path_worker.routeCancelled.connect(self.on_route_cancelled)
+        self.route_job_id = 0
+        self.route_start = None
+        self.route_goals = []
+        self.route_key = None
+        self.route_version = 0
+        self.route_cache = RouteCache(ROUTE_CACHE_SIZE)
+        self.business_table = None  # Precomputed business routes loaded with a .navgrid map
+        self.street_scores = load_street_scores()  # Joined onto every grid's streets for its cost profiles
+        self.cost_profiles = None  # CostProfiles of the current grid
+        self.street_index = None  # StreetIndex of the current grid
+
+        # Background OpenAI stream, only the latest request (directions_job_id) is shown
+        self.directions_worker = DirectionsWorker()
+        self.directions_worker.token.connect(self.on_directions_token)
+        self.directions_worker.directionsFinished.connect(self.on_directions_finished)
+        self.directions_job_id = 0
+        self.directions_key = None  # Route cache key the streamed directions belong to
+        self.directions_local = ""  # Template directions restored if the stream fails
+        self.directions_streamed = False
+        self.directions_started = 0.0  # perf_counter when the stream was requested, for the ai phase
 
 
         # For rectangle fill feature
@@ -89,6 +140,12 @@ class MainWindow(QMainWindow):
         self.info_label.setWordWrap(True)
         info_layout.addWidget(self.info_label, 1)
 
+        self.stats_label = QLabel("Run a route to see its stats")
+        self.stats_label.setMinimumHeight(60)
+        self.stats_label.setStyleSheet("background-color: #f0f0f0; padding: 6px; font-family: monospace;")
+        self.stats_label.setWordWrap(True)
+        info_layout.addWidget(self.stats_label, 1)
+
         self.directions_box = QTextEdit()
         self.directions_box.setReadOnly(True)
         self.directions_box.setMinimumHeight(60)
@@ -98,10 +155,7 @@ class MainWindow(QMainWindow):
         grid_layout.addWidget(info_panel)
 
         # Create Grid
-        self.grid = [[Node(row, col, CELL_SIZE, ROWS, COLS, self, 1) for col in range(COLS)] for row in range(ROWS)]
-        for row in self.grid:
-            for cell in row:
-                self.scene.addItem(cell)
+        self.createNewGrid(ROWS, COLS)
 
         # Right Panel
         right_panel = QWidget()
@@ -119,6 +173,42 @@ class MainWindow(QMainWindow):
         self.business_picker = BusinessPicker(self)
         right_layout.addWidget(self.business_picker)
 
+        self.street_picker = StreetPicker(self)
+        right_layout.addWidget(self.street_picker)
+
+        self.polish_checkbox = QCheckBox("Polish directions with AI")
+        self.polish_checkbox.setChecked(self.polish_directions)
+        self.polish_checkbox.toggled.connect(self.set_polish_directions)
+        right_layout.addWidget(self.polish_checkbox)
+
+        self.optimize_checkbox = QCheckBox("Optimize stop order")
+        self.optimize_checkbox.setChecked(self.optimize_order)
+        self.optimize_checkbox.toggled.connect(self.set_optimize_order)
+        right_layout.addWidget(self.optimize_checkbox)
+
+        self.profile_checkbox = QCheckBox("Profile runs (cProfile + tracemalloc)")
+        self.profile_checkbox.setChecked(self.profile_runs)
+        self.profile_checkbox.toggled.connect(self.set_profile_runs)
+        right_layout.addWidget(self.profile_checkbox)
+
+        self.mode_selector = QComboBox()
+        self.mode_selector.addItems(EXECUTION_MODES)
+        self.mode_selector.currentTextChanged.connect(self.set_execution_mode)
+        right_layout.addWidget(QLabel("Execution Mode:"))
+        right_layout.addWidget(self.mode_selector)
+
+        self.engine_selector = QComboBox()
+        self.engine_selector.addItems(SEARCH_ENGINES)
+        self.engine_selector.currentTextChanged.connect(self.set_search_engine)
+        right_layout.addWidget(QLabel("Search Engine:"))
+        right_layout.addWidget(self.engine_selector)
+
+        self.profile_selector = QComboBox()
+        self.profile_selector.addItems(COST_PROFILES)
+        self.profile_selector.currentTextChanged.connect(self.set_cost_profile)
+        right_layout.addWidget(QLabel("Cost Profile:"))
+        right_layout.addWidget(self.profile_selector)
+
         self.run_button = QPushButton("Run")
         self.run_button.clicked.connect(self.find_path)
         right_layout.addWidget(self.run_button)
@@ -140,96 +230,155 @@ class MainWindow(QMainWindow):
         self.reset_board_button.clicked.connect(self.reset_grid)
         right_layout.addWidget(self.reset_board_button)
 
+        self.export_stats_button = QPushButton("Export Run Stats")
+        self.export_stats_button.clicked.connect(self.export_run_stats)
+        right_layout.addWidget(self.export_stats_button)
+
     
+    # Queues a search on the worker thread. Results arrive through the on_route_* slots.
     def find_path(self):
-        print("Starting A* Pathfinding...")
-        for row in self.grid:
-            for node in row:
-                node.update_neighbors(self.grid)  # Updates all nodes in the grid with their neighbors.
-
+        print(f"Starting {self.search_engine} pathfinding...")
         goals = self.goals[:]
         if not self.start or not goals:
             print("No start or goals set!")
             return
 
-        current_start = self.start
-        full_path = []  # List to store the full path across all goals
-        
+        self.route_start = self.start
+        self.route_goals = goals
+        start = self.routing_grid.index(self.start.row, self.start.col)
+        goal_indices = [self.routing_grid.index(goal.row, goal.col) for goal in goals]
+        self.route_key = RouteCache.key(start, goal_indices, optimize=self.optimize_order, engine=self.search_engine)
+        self.route_version = self.routing_grid.version
+        stats = self.run_stats = RunStats(f"{self.search_engine}, {self.execution_mode}, {len(goals)} goal(s)")
+
+        # Cached and precomputed routes are redrawn straight away, cancelling any search still running
+        entry = self.route_cache.get(self.route_key)
+        segments = entry.segments if entry is not None else self.table_route(start, goal_indices)
+        if segments is not None:
+            print("Route found in cache" if entry is not None else "Route found in business table")
+            stats.label += ", from cache" if entry is not None else ", from business table"
+            self.path_worker.cancel()
+            self.route_job_id = 0
+            self.visualizer = SearchVisualizer(self, "instant", self.route_job_id)
+            self.show_route(segments)
+            return
+
+        # Neighbor lists are built on first use and patched after edits; the snapshot copies them
+        with stats.phase("neighbors"):
+            self.routing_grid.neighbor_lists()
+            self.routing_grid.move_costs()
+        with stats.phase("setup"):
+            self.route_job_id = self.path_worker.submit(self.routing_grid, start, goal_indices, self.execution_mode, self.optimize_order,
+                                                        self.search_engine, stats, self.profile_runs)
+        self.visualizer = SearchVisualizer(self, self.execution_mode, self.route_job_id)
         for goal in goals:
             print(f"Finding path to goal at ({goal.row}, {goal.col})") 
-            self.stop_requested = False  # Reset stop flag before starting
-
-
-            # Initialize the priority queue for open set
-            open_set = PriorityQueue()
-            open_set.put((0, current_start))
-            came_from = {}  # Dictionary to keep track of the path
-            closed_set = set()  # Set to track fully checked nodes
-            g_score = {node: float("inf") for row in self.grid for node in row}
-            g_score[current_start] = 0
-            f_score = {node: float("inf") for row in self.grid for node in row}
-            f_score[current_start] = self.heuristic(current_start, goal)
-
-            open_set_hash = {current_start}
-
-            while not open_set.empty():
-                if self.stop_requested:
-                    print("[INFO] Pathfinding stopped by user.")
-                    self.fake_color()
-                    return
-
-                _, current = open_set.get()
-                open_set_hash.remove(current)
-
-                if current in closed_set:
-                    continue
-
-                if current == goal:
-                    print(f"Goal at ({goal.row}, {goal.col}) reached!")
-                    segment_path = self.reconstruct_path(came_from, current)  # Get the segment path
-                    full_path.extend(segment_path)  # Append to full path
-                    current_start = goal  # Update the start for the next segment
-                    break  # Exit loop and move to the next goal
-
-                for neighbor in current.neighbors:
-                    temp_g_score = g_score[current] + neighbor.cost / 80 # Edit this to tweak weights (100)
-
-                    if temp_g_score < g_score[neighbor]:
-                        came_from[neighbor] = current
-                        g_score[neighbor] = temp_g_score
-                        heuristic = self.heuristic(neighbor, goal)
-                        f_score[neighbor] = temp_g_score + heuristic
-                        neighbor.heuristic_to_goal = heuristic
-                        neighbor.f_score = f_score[neighbor]
-
-                        if neighbor not in open_set_hash:
-                            open_set.put((f_score[neighbor], neighbor))
-                            open_set_hash.add(neighbor)
-                            self.set_preview_color(neighbor, self.color_map['open'])
-                            QApplication.processEvents()
-                
-                closed_set.add(current)
-                self.set_preview_color(current, self.color_map['closed'])
-                QApplication.processEvents()
-
-            else:
-                # If we exit the while loop without breaking, no path was found
-                print(f"No path found to goal at ({goal.row}, {goal.col})!")
-                self.real_color()
-                return  # Stop searching if one goal is unreachable
+
+    # Legs looked up in the precomputed business table, or None unless every leg is a business pair
+    def table_route(self, start, goal_indices):
+        if self.business_table is None or self.optimize_order:
+            return None
+        segments = []
+        for goal in goal_indices:
+            segment = self.business_table.route(start, goal)
+            if segment is None:
+                return None
+            segments.append(segment)
+            start = goal
+        return segments
+
+    def on_route_frontier(self, job_id, opened, closed):
+        if job_id == self.route_job_id:
+            with self.run_stats.phase("visualize"):
+                self.visualizer.apply_frontier(opened, closed)
+
+    def on_route_found(self, job_id, segments, touched):
+        if job_id != self.route_job_id:
+            return  # A newer request replaced this one
+
+        # Only cache if the grid wasn't edited while the worker searched its snapshot
+        if self.routing_grid.version == self.route_version:
+            self.route_cache.put(self.route_key, segments, touched)
+        self.show_route(segments)
+
+    # Paints a route's legs and fills in its directions, from the cache when already generated
+    def show_route(self, segments):
+        route_key = self.route_key
+        stats = self.run_stats
+        full_path = []  # List to store the full path across all goals
+        goals = [self.node_at(segment[-1]) for segment in segments]  # Visiting order, which may differ from click order
+        with stats.phase("reconstruct"):
+            for goal, segment in zip(goals, segments):
+                print(f"Goal at ({goal.row}, {goal.col}) reached!")
+                full_path.extend(self.reconstruct_path(segment))  # Append to full path
 
         # After all goals are processed, reconstruct the entire path taken
         print("Reconstructing full path through all goals...") 
-        self.visualize_full_path(full_path)
+        with stats.phase("visualize"):
+            self.visualize_full_path(full_path)
+        if self.visualizer.superseded():
+            return
         print("All goals reached!") 
-        print("Generating Play By Play") 
-        self.generate_directions_from_path(full_path)
-
 
+        entry = self.route_cache.get(route_key)
+        if entry is not None and entry.directions is not None:
+            self.directions_box.setText(entry.directions)
+            self.finish_run_stats()
+            return
+        print("Generating Play By Play") 
+        with stats.phase("directions"):
+            self.generate_directions_from_path(full_path, route_key)
+        if not self.directions_job_id:
+            self.finish_run_stats()  # Otherwise once the OpenAI stream ends
+
+    def on_route_failed(self, job_id, goal_index):
+        if job_id == self.route_job_id:
+            goal = self.route_goals[goal_index]
+            print(f"No path found to goal at ({goal.row}, {goal.col})!")
+            self.real_color()
+            self.finish_run_stats()
+
+    def on_route_cancelled(self, job_id):
+        if job_id == self.route_job_id:
+            print("[INFO] Pathfinding stopped by user.")
+            self.fake_color()
+
+    def set_execution_mode(self, mode):
+        self.execution_mode = mode
+
+    def set_polish_directions(self, enabled):
+        self.polish_directions = enabled
+
+    def set_optimize_order(self, enabled):
+        self.optimize_order = enabled
+
+    def set_search_engine(self, engine):
+        self.search_engine = engine
+
+    # Swaps in the profile's precomputed costs; cached routes are dropped with the old costs
+    def set_cost_profile(self, profile):
+        self.cost_profiles.activate(profile)
+        print(f"Cost profile: {profile}")
+
+    def set_profile_runs(self, enabled):
+        self.profile_runs = enabled
+
+    # Shows the latest run's counters and timings in the info panel and logs them
+    def finish_run_stats(self):
+        self.stats_label.setText(self.run_stats.summary())
+        print(self.run_stats.log_line())
+
+    # Writes the latest run's stats as JSON and as Chrome trace events
+    def export_run_stats(self):
+        if self.run_stats is None:
+            print("No run to export!")
+            return
+        stats_path, trace_path = self.run_stats.export()
+        print(f"Run stats exported to {stats_path} and {trace_path}")
 
     def request_stop(self):
         print("[INFO] Pathfinding stop requested.")
-        self.stop_requested = True
+        self.path_worker.cancel()
 
 
     # Manhattan distance
@@ -239,139 +388,200 @@ class MainWindow(QMainWindow):
         return dx + dy
 
 
-    # Reconstructs the path from goal to start and returns it
-    def reconstruct_path(self, came_from, current):
-        path_segment = []
-        while current in came_from:
-            current = came_from[current]
-            if current != self.start:
-                self.set_preview_color(current, self.color_map['path_point'])
-                QApplication.processEvents()  # Force UI update
-                path_segment.append(current)  # Store in path list
-        
-        path_segment.reverse()  # Reverse to get start -> goal order
+    # Turns a segment of cell indices into nodes, excluding the goal and the overall start
+    def reconstruct_path(self, segment):
+        path_segment = [self.node_at(index) for index in segment[:-1]]
+        path_segment = [node for node in path_segment if node != self.route_start]
+        self.visualizer.paint_segment(path_segment)
         return path_segment
 
-    # Given a list of nodes , return a list of dictionaries with row, col, and street name
-    def get_path_summary(self, path_nodes):
-        summary = []
-
-        for node in path_nodes:
-            entry = {
-                "row": node.row,
-                "col": node.col,
-                "street": node.streetName.strip() if node.streetName else "Unnamed Road"
-            }
-            summary.append(entry)
-
-        return summary
+    def node_at(self, index):
+        row, col = divmod(int(index), len(self.grid[0]))
+        return self.grid[row][col]
 
-    # OpenAI call with path summary to get normal map navigational readings
-    def generate_directions_from_path(self, path_nodes):
+    # Local directions from the route's street segments, optionally polished by OpenAI.
+    # The local directions show right away; the OpenAI response streams in from the directions worker.
+    def generate_directions_from_path(self, path_nodes, route_key=None):
+        self.directions_job_id = 0  # Ignore anything still streaming for an older route
         if not path_nodes:
             self.directions_box.setText("No path found.")
             return
 
-        # Prepare the path summary
-        summary = self.get_path_summary(path_nodes)
-
-        # Format it as a string
-        path_text = "[\n" + ",\n".join([
-            f"{{\"row\": {n['row']}, \"col\": {n['col']}, \"street\": \"{n['street']}\"}}"
-            for n in summary
-        ]) + "\n]"
-
-        # Send the prompt to OpenAI
-        try:
-            ai = AIAPI()
-            apiResponse = ai.getAPIResponse(path_text)
+        # Compress the path into street segments and show template directions right away
+        path = [self.routing_grid.index(node.row, node.col) for node in path_nodes]
+        segments = compress_route(self.routing_grid, path)
+        self.directions_local = describe_route(segments)
+        self.directions_box.setText(self.directions_local)
+        if not self.polish_directions:
+            return
 
-            if apiResponse is None:
-                # Exceptions
-                print('API Call Failed\n Exiting ...')
-                apiResponse = f"Error with API Request, most likely insufficient api tokens.\n{path_text}"
-            else:
-                print(f'ChatGPT Response\n--------------------\n{apiResponse}\n--------------------')
+        # Send the segment summary to OpenAI without blocking the GUI
+        self.directions_key = route_key
+        self.directions_streamed = False
+        self.directions_started = time.perf_counter()
+        self.directions_job_id = self.directions_worker.submit(segments_text(segments))
 
-            self.directions_box.setText(apiResponse)
+    def on_directions_token(self, job_id, text):
+        if job_id != self.directions_job_id:
+            return
+        if not self.directions_streamed:
+            self.directions_streamed = True
+            self.directions_box.clear()
+        self.directions_box.moveCursor(QTextCursor.End)
+        self.directions_box.insertPlainText(text)
+
+    def on_directions_finished(self, job_id, response):
+        if job_id != self.directions_job_id:
+            return
+        self.directions_job_id = 0
+        self.run_stats.add_phase("ai", self.directions_started, time.perf_counter() - self.directions_started)
+        self.finish_run_stats()
+        if response is None:
+            # Exceptions, the local directions stay up
+            print('API Call Failed, keeping local directions')
+            self.directions_box.setText(self.directions_local)
+            return
+        print(f'ChatGPT Response\n--------------------\n{response}\n--------------------')
 
-        except Exception as e:
-            self.directions_box.setText(f"Error generating directions: {e}")
+        self.directions_box.setText(response)
+        if self.directions_key is not None:
+            self.route_cache.set_directions(self.directions_key, response)
 
     # Visually reconstructs the entire path across all goals
     def visualize_full_path(self, full_path):
-        for node in full_path:
-            self.set_preview_color(node, self.color_map['start'])
-            QApplication.processEvents()
+        self.visualizer.paint_path(full_path, self.color_map['start'])
 
     def set_preview_color(self, cell, color):
-        cell.color = color
         cell.setBrush(color)
 
+    # (first row, first col, last row, last col) of the grid currently on screen
+    def visible_cells(self):
+        rect = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        return (max(int(rect.top() // CELL_SIZE), 0), max(int(rect.left() // CELL_SIZE), 0),
+                int(rect.bottom() // CELL_SIZE), int(rect.right() // CELL_SIZE))
+
+    # Previews an array of cells in one color until the next real_color
+    def highlight_cells(self, cells, color):
+        if self.renderer == "raster":
+            self.grid.show_cells(cells, color)
+            return
+        brush = shared_brush(color)
+        for index in cells.tolist():
+            self.node_at(index).setBrush(brush)
+
     def real_color(self):
+        if self.renderer == "raster":
+            self.grid.show_types(self.routing_grid.types)
+            return
+        brushes = [shared_brush(self.color_map[cell_type]) for cell_type in CELL_TYPES]
+        types = self.routing_grid.types.tolist()
         for row in self.grid:
             for cell in row:
-                cell.color = color_map[cell.type]
-                cell.setBrush(cell.color)
+                cell.setBrush(brushes[types[cell.index]])
     
     def fake_color(self):
         print("Fake Color Called")
-        for row in self.grid:
-            for cell in row:
-                cell.setBrush(cell.color)
+        # Nothing to restore: in both renderers a cell's color is what is on screen
 
     def reset_grid(self):
-        for row in self.grid:
-            for cell in row:
-                cell.reset()
+        self.set_types(np.full(self.routing_grid.size, TYPE_CODES['reset'], dtype=np.uint8))
         self.start = None
         self.goals = []
         print("Grid reset.")
     
-    def createNewGrid(self, rows, cols):
-        self.grid = [[Node(row, col, CELL_SIZE, rows, cols, self, 1) for col in range(cols)] for row in range(rows)]
+    # Replaces the grid with an empty one, or with the cells of routing_grid if given
+    def createNewGrid(self, rows, cols, routing_grid=None):
+        self.routing_grid = routing_grid if routing_grid is not None else RoutingGrid(rows, cols)  # Array mirror of the grid used for searching
+        self.route_cache.attach(self.routing_grid)
+        self.business_table = None
+        # A new grid's costs are its manual ones, so the profile selection starts over
+        self.cost_profiles = CostProfiles(self.routing_grid, self.street_scores)
+        if hasattr(self, 'profile_selector'):
+            self.profile_selector.blockSignals(True)
+            self.profile_selector.setCurrentText(MANUAL_PROFILE)
+            self.profile_selector.blockSignals(False)
+        self.street_index = StreetIndex(self.routing_grid)
+        self.street_index.names_listeners.append(self.refresh_street_list)
+        self.refresh_street_list()
         self.start = None
         self.goals = []
         self.scene.clear()
+        if self.renderer == "raster":
+            self.grid = RasterGrid(self, rows, cols, CELL_SIZE)
+            self.grid.show_types(self.routing_grid.types)
+            self.scene.addItem(self.grid)
+            self.restore_endpoints()
+            return
+
+        # Nodes are views of the routing grid's cells; only their colors are set here
+        self.grid = [[Node(row, col, CELL_SIZE, self) for col in range(cols)] for row in range(rows)]
         for row in self.grid:
             for cell in row:
                 self.scene.addItem(cell)
+        self.real_color()
+        self.restore_endpoints()
+
+    # Keeps the street picker's list in step with streets painted onto or off the grid
+    def refresh_street_list(self):
+        if hasattr(self, 'street_picker'):
+            self.street_picker.update_list()
+
+    # Re-links start/goal references to cells whose type says they are endpoints
+    def restore_endpoints(self):
+        types = self.routing_grid.types
+        for index in np.flatnonzero(types == TYPE_CODES['start']).tolist():
+            self.start = self.node_at(index)
+        self.goals = [self.node_at(index) for index in np.flatnonzero(types == TYPE_CODES['goal']).tolist()]
+
+    # Replaces every cell's type at once, rebuilding adjacency a single time instead of per cell
+    def set_types(self, types):
+        self.routing_grid.types[:] = types
+        self.routing_grid.build_adjacency()
+        self.real_color()
+
+    # The cell under a scene position, by arithmetic in raster mode and by item lookup otherwise
+    def cell_at_scene_pos(self, scene_pos):
+        if self.renderer == "raster":
+            return self.grid.cell_at(scene_pos)
+        for item in self.scene.items(scene_pos):
+            if isinstance(item, Node):
+                return item
+        return None
+
+    def closeEvent(self, event):
+        self.path_worker.shutdown()
+        self.directions_worker.shutdown()
+        super().closeEvent(event)
 
     # Rectangle Fill Stuff
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_T and not event.isAutoRepeat():
             self.rectangle_fill_active = True
             pos = self.view.mapFromGlobal(QCursor.pos())
-            scene_pos = self.view.mapToScene(pos)
-            items = self.scene.items(scene_pos)
-            for item in items:
-                if isinstance(item, Node):
-                    self.rectangle_fill_start = (item.row, item.col)
-                    print(f"[DEBUG] Rectangle fill start: {self.rectangle_fill_start}")
-                    break
+            item = self.cell_at_scene_pos(self.view.mapToScene(pos))
+            if item is not None:
+                self.rectangle_fill_start = (item.row, item.col)
+                print(f"[DEBUG] Rectangle fill start: {self.rectangle_fill_start}")
 
     # Rectangle Fill Stuff
     def keyReleaseEvent(self, event):
         if event.key() == Qt.Key_T and not event.isAutoRepeat() and self.rectangle_fill_start:
             pos = self.view.mapFromGlobal(QCursor.pos())
-            scene_pos = self.view.mapToScene(pos)
-            items = self.scene.items(scene_pos)
-            for item in items:
-                if isinstance(item, Node):
-                    start_row, start_col = self.rectangle_fill_start
-                    end_row, end_col = item.row, item.col
-                    print(f"[DEBUG] Rectangle fill end: ({end_row}, {end_col})")
-
-                    top = min(start_row, end_row)
-                    bottom = max(start_row, end_row)
-                    left = min(start_col, end_col)
-                    right = max(start_col, end_col)
-
-                    for r in range(top, bottom + 1):
-                        for c in range(left, right + 1):
-                            node = self.grid[r][c]
-                            node.updateColor()
-                    break
+            item = self.cell_at_scene_pos(self.view.mapToScene(pos))
+            if item is not None:
+                start_row, start_col = self.rectangle_fill_start
+                end_row, end_col = item.row, item.col
+                print(f"[DEBUG] Rectangle fill end: ({end_row}, {end_col})")
+
+                top = min(start_row, end_row)
+                bottom = max(start_row, end_row)
+                left = min(start_col, end_col)
+                right = max(start_col, end_col)
+
+                for r in range(top, bottom + 1):
+                    for c in range(left, right + 1):
+                        node = self.grid[r][c]
+                        node.updateColor()
 
             self.rectangle_fill_start = None
             self.rectangle_fill_active = False
@@ -389,21 +599,28 @@ class MainWindow(QMainWindow):
     def update_types_from_colors(self):
         updated = 0
         color_to_type = {v.name(): k for k, v in self.color_map.items()}
+        types = self.routing_grid.types.copy()
 
         for row in self.grid:
             for node in row:
                 color_name = node.color.name()
                 if color_name in color_to_type:
-                    node_type = color_to_type[color_name]
-                    node.type = node_type
+                    types[node.index] = TYPE_CODES[color_to_type[color_name]]
                     updated += 1
                 else:
                     print(f"[WARNING] Unknown color for node at ({node.row}, {node.col}): {color_name}")
+        self.set_types(types)
         print(f"[INFO] Updated {updated} node types from color.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renderer", choices=RENDERERS, default="items",
+                        help="items: one QGraphicsRectItem per cell, raster: the whole grid as one image")
+    parser.add_argument("--profile", action="store_true", help="Run searches under cProfile and tracemalloc (see runStats)")
+    args = parser.parse_args()
+
     app = QApplication([])
-    window = MainWindow()
+    window = MainWindow(args.renderer, args.profile)
     window.show()
     app.exec_()
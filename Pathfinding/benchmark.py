@@ -0,0 +1,332 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Runs without a display
+import gc
+import sys
+import csv
+import json
+import time
+import zlib
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+import numpy as np
+from PIL import Image
+from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+from routingGrid import RoutingGrid, TYPE_CODES, TRAVERSABLE, CELL_TYPES, COST_SCALE, astar
+from gridBinary import BINARY_EXTENSION, write_grid
+from routeDirections import compress_route, describe_route
+from searchVisualizer import FrontierRecorder, SearchVisualizer
+from pathWorker import CancellationToken
+from costProfiles import COST_PROFILES, MANUAL_PROFILE
+import imageToCSV
+
+# Bumped whenever the report layout changes, so old baselines are not compared field by field
+REPORT_FORMAT = 1
+PACKAGE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+GRID_FOLDER = os.path.join(PACKAGE_FOLDER, "Grids")
+MAP_FIXTURES = {"FinalMap": "FinalMap.csv"}  # Name -> file in GRID_FOLDER
+SYNTHETIC_SIZES = {"small": (250, 500), "medium": (1000, 2000), "large": (2000, 4000)}  # (rows, cols)
+IMAGE_FIXTURES = {"test": os.path.join(os.path.dirname(PACKAGE_FOLDER), "test.JPG")}  # Name -> image
+SYNTHETIC_IMAGE_SIZE = (300, 600)  # Cells; each is PIXEL_PER_HEIGHT x PIXEL_PER_WIDTH pixels
+BARRIER_FRACTION = 0.25
+COST_RANGE = (60.0, 110.0)  # Street costs on the synthetic maps, like FinalMap's 67.5 - 107.5
+QUERY_RADIUS = 100  # Synthetic queries end within this many rows and cols of their start
+CELL_MODEL_LIMIT = 200_000  # Largest map, in cells, to build one QGraphicsRectItem per cell for
+
+
+# Random map of streets and barriers. Same seed, same map.
+def synthetic_grid(rows, cols, seed):
+    rng = np.random.default_rng(seed)
+    types = np.where(rng.random(rows * cols) < BARRIER_FRACTION, TYPE_CODES['barrier'], TYPE_CODES['reset']).astype(np.uint8)
+    costs = np.round(rng.uniform(*COST_RANGE, rows * cols), 1).astype(np.float32)
+    return RoutingGrid(rows, cols, types, costs)
+
+
+# Image of random palette blocks, the shape imageToCSV expects from a map screenshot
+def synthetic_image(seed):
+    rows, cols = SYNTHETIC_IMAGE_SIZE
+    rng = np.random.default_rng(seed)
+    palette = np.array(list(imageToCSV.color_map.values()), dtype=np.uint8)
+    blocks = palette[rng.integers(len(palette), size=(rows, cols))]
+    pixels = blocks.repeat(imageToCSV.PIXEL_PER_HEIGHT, axis=0).repeat(imageToCSV.PIXEL_PER_WIDTH, axis=1)
+    return Image.fromarray(pixels, "RGB")
+
+
+# Writes grid in the GridFileManager CSV export format
+def write_csv(path, grid, businesses):
+    types = [CELL_TYPES[code] for code in grid.types.tolist()]
+    costs = [f"{cost:g}" for cost in grid.costs.tolist()]
+    streets = [grid.street_name(street_id) for street_id in grid.street_ids.tolist()]
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([field for business in businesses for field in map(str, business)])
+        for row in range(grid.rows):
+            cells = range(row * grid.cols, (row + 1) * grid.cols)
+            writer.writerow([f"{types[index]}:0,0,0:{costs[index]}:{streets[index]}" for index in cells])
+
+
+# Start/goal cell pairs: business to business on real maps, nearby street cells on synthetic ones
+def fixture_queries(grid, businesses, count, seed):
+    rng = random.Random(seed)
+    if businesses:
+        cells = [grid.index(int(y), int(x)) for _, x, y, _ in businesses]
+        return [tuple(rng.sample(cells, 2)) for _ in range(count)]
+
+    walkable = TRAVERSABLE[grid.types]
+    queries = []
+    while len(queries) < count:
+        start = rng.randrange(grid.size)
+        row, col = grid.position(start)
+        goal_row = min(max(row + rng.randint(-QUERY_RADIUS, QUERY_RADIUS), 0), grid.rows - 1)
+        goal_col = min(max(col + rng.randint(-QUERY_RADIUS, QUERY_RADIUS), 0), grid.cols - 1)
+        goal = grid.index(goal_row, goal_col)
+        if walkable[start] and walkable[goal] and start != goal:
+            queries.append((start, goal))
+    return queries
+
+
+# Runs function repeat times. Returns ({"min", "median"} in milliseconds, last result).
+def timed(function, repeat, prepare=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"min": round(min(times), 3), "median": round(statistics.median(times), 3)}, result
+
+
+def checksum(*arrays):
+    value = 0
+    for array in arrays:
+        value = zlib.crc32(np.ascontiguousarray(array).tobytes(), value)
+    return value
+
+
+# Imports path through the window's GridFileManager, as the Import button does
+def import_file(window, path):
+    manager = window.gridFileManager
+    manager.folder_path = os.path.dirname(path)
+    manager.file_selector.setEditText(os.path.basename(path))
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        manager.import_grid()
+
+
+# A* with the throttled search preview painted on the window, then the path, as find_path shows it
+def visualized_astar(app, window, grid, start, goal):
+    window.route_job_id += 1
+    visualizer = SearchVisualizer(window, "throttled", window.route_job_id)
+    recorder = FrontierRecorder("throttled", visualizer.apply_frontier, CancellationToken())
+    path = astar(grid, start, goal, **recorder.callbacks())
+    recorder.flush()
+    if path is not None:
+        visualizer.paint_path([window.node_at(index) for index in path.tolist()], window.color_map['path_point'])
+    app.processEvents()
+    return path
+
+
+def run_fixture(app, window, name, path, queries, repeat, seed):
+    print(f"Benchmarking {name}...", file=sys.stderr)
+    timings = {}
+    timings["import" + os.path.splitext(path)[1].replace(".", "_")], _ = timed(lambda: import_file(window, path), repeat)
+    grid = window.routing_grid
+    businesses = window.businesses
+    if not path.endswith(BINARY_EXTENSION):
+        # Also time the binary format for the same map
+        with tempfile.TemporaryDirectory() as folder:
+            binary_path = os.path.join(folder, name + BINARY_EXTENSION)
+            write_grid(binary_path, grid, businesses)
+            timings["import_navgrid"], _ = timed(lambda: import_file(window, binary_path), repeat)
+            import_file(window, path)
+            grid = window.routing_grid
+
+    def build_neighbors():
+        grid.build_adjacency()
+        grid.neighbor_lists()
+        grid.move_costs()
+
+    timings["neighbors"], _ = timed(build_neighbors, repeat)
+
+    # Joining the street scores, then a round trip through every profile back to the manual costs
+    profiles = window.cost_profiles
+    timings["cost_profiles"], _ = timed(profiles.build, repeat)
+    timings["profile_switch"], _ = timed(lambda: [profiles.activate(profile) for profile in COST_PROFILES[1:] + [MANUAL_PROFILE]], repeat)
+
+    pairs = fixture_queries(grid, businesses, queries, seed)
+    timings["astar"], paths = timed(lambda: [astar(grid, start, goal) for start, goal in pairs], repeat)
+    timings["astar_visualized"], _ = timed(lambda: [visualized_astar(app, window, grid, start, goal) for start, goal in pairs],
+                                           repeat, prepare=window.real_color)
+    window.real_color()
+    found = [path for path in paths if path is not None]
+    timings["summary"], summaries = timed(lambda: [describe_route(compress_route(grid, path)) for path in found], repeat)
+
+    # Reference results, to tell a faster run from one that finds different routes
+    results = []
+    for (start, goal), path in zip(pairs, paths):
+        expanded = []
+        astar(grid, start, goal, on_close=expanded.append)
+        results.append({
+            "start": list(grid.position(start)),
+            "goal": list(grid.position(goal)),
+            "cost": None if path is None else round(float(grid.costs[path[1:]].astype(np.float64).sum()) / COST_SCALE, 6),
+            "cells": 0 if path is None else len(path),
+            "expanded": len(expanded),
+        })
+    reference = {
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "checksum": checksum(grid.types, grid.costs),
+        "queries": results,
+        "summary_lines": [summary.count("\n") + 1 for summary in summaries],
+    }
+    for timing in ("astar", "astar_visualized"):
+        timings[timing]["per_query"] = round(timings[timing]["median"] / len(pairs), 3)
+    return {"timings": timings, "reference": reference}
+
+
+# Time and Python memory of building the GUI cells for grid, with each renderer
+def run_cells(app, name, grid, repeat):
+    from application import MainWindow, RENDERERS
+    print(f"Benchmarking cells of {name}...", file=sys.stderr)
+    timings = {}
+    memory = {}
+    for renderer in RENDERERS:
+        window = MainWindow(renderer=renderer)
+        clear = lambda: window.createNewGrid(1, 1)
+        timings["create_" + renderer], _ = timed(lambda: window.createNewGrid(grid.rows, grid.cols, grid), repeat, prepare=clear)
+        clear()
+        gc.collect()
+        tracemalloc.start()
+        window.createNewGrid(grid.rows, grid.cols, grid)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory["bytes_per_cell_" + renderer] = round(current / grid.size, 1)
+        window.close()
+        app.processEvents()
+    return {"timings": timings, "memory": memory, "reference": {"rows": grid.rows, "cols": grid.cols}}
+
+
+def run_image(name, image, repeat):
+    print(f"Benchmarking image {name}...", file=sys.stderr)
+    timings = {}
+    timings["palette"], indices = timed(lambda: imageToCSV.palette_indices(image), repeat)
+    with tempfile.TemporaryDirectory() as folder:
+        image_path = os.path.join(folder, name + ".png")
+        image.save(image_path)
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            for output_format in imageToCSV.OUTPUT_FORMATS:
+                timings["convert_" + output_format], _ = timed(lambda: imageToCSV.process_image(image_path, output_format, folder), repeat)
+    rows, cols = indices.shape
+    return {"timings": timings, "reference": {"rows": rows, "cols": cols, "checksum": checksum(indices.astype(np.int64))}}
+
+
+def run_benchmarks(fixtures, queries=5, repeat=3, seed=0, images=True):
+    from application import MainWindow
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow(renderer="raster")
+    window.polish_directions = False
+    report = {
+        "format": REPORT_FORMAT,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "qt": QT_VERSION_STR,
+            "platform": platform.platform(),
+            "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "settings": {"fixtures": list(fixtures), "queries": queries, "repeat": repeat, "seed": seed},
+        "fixtures": {},
+        "cells": {},
+        "images": {},
+    }
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            for name in fixtures:
+                if name in MAP_FIXTURES:
+                    path = os.path.join(GRID_FOLDER, MAP_FIXTURES[name])
+                else:
+                    rows, cols = SYNTHETIC_SIZES[name]
+                    path = os.path.join(folder, f"synthetic_{name}.csv")
+                    write_csv(path, synthetic_grid(rows, cols, seed), [])
+                report["fixtures"][name] = run_fixture(app, window, name, path, queries, repeat, seed)
+                if window.routing_grid.size <= CELL_MODEL_LIMIT:
+                    report["cells"][name] = run_cells(app, name, window.routing_grid, repeat)
+                if name not in MAP_FIXTURES:
+                    os.remove(path)
+        if images:
+            for name, path in IMAGE_FIXTURES.items():
+                if os.path.exists(path):
+                    with Image.open(path) as image:
+                        report["images"][name] = run_image(name, image.convert("RGB"), repeat)
+            report["images"]["synthetic"] = run_image("synthetic", synthetic_image(seed), repeat)
+    finally:
+        window.close()
+    return report
+
+
+# Prints the timing ratios against an earlier report. Returns the reference results that differ.
+def compare_reports(baseline, report):
+    if baseline.get("format") != report["format"]:
+        print(f"Baseline has report format {baseline.get('format')}, expected {report['format']}; not compared")
+        return []
+    mismatches = []
+    for section in ("fixtures", "cells", "images"):
+        for name, current in report[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if previous is None:
+                continue
+            for timing, values in current["timings"].items():
+                before = previous["timings"].get(timing)
+                if before is None:
+                    continue
+                ratio = values["median"] / before["median"] if before["median"] else float('inf')
+                print(f"{name:>10} {timing:<18} {before['median']:>12.3f} ms -> {values['median']:>12.3f} ms  ({ratio:.2f}x)")
+            for measure, value in current.get("memory", {}).items():
+                before = previous.get("memory", {}).get(measure)
+                if before:
+                    print(f"{name:>10} {measure:<18} {before:>12.1f} B  -> {value:>12.1f} B   ({value / before:.2f}x)")
+            if previous["reference"] != current["reference"]:
+                mismatches.append(f"{section}/{name}")
+    for name in mismatches:
+        print(f"Reference results differ from the baseline for {name}")
+    return mismatches
+
+
+def print_report(report):
+    for section in ("fixtures", "cells", "images"):
+        for name, result in report[section].items():
+            for timing, values in result["timings"].items():
+                print(f"{name:>10} {timing:<18} {values['median']:>12.3f} ms (min {values['min']:.3f})")
+            for measure, value in result.get("memory", {}).items():
+                print(f"{name:>10} {measure:<18} {value:>12.1f} B")
+
+
+if __name__ == "__main__":
+    fixture_names = list(MAP_FIXTURES) + list(SYNTHETIC_SIZES)
+    parser = argparse.ArgumentParser(description="Headless benchmarks for grid import, searching, directions and image conversion")
+    parser.add_argument("--fixtures", nargs="+", choices=fixture_names, default=fixture_names)
+    parser.add_argument("--queries", type=int, default=5, help="Searches per map")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each timing; the median is reported")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic maps and queries")
+    parser.add_argument("--no-images", action="store_true", help="Skip the image conversion benchmarks")
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Earlier report to compare against; exits with 1 if its reference results differ")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.fixtures, args.queries, args.repeat, args.seed, not args.no_images)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write("\n")
+    print_report(report)
+    print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            if compare_reports(json.load(file), report):
+                sys.exit(1)
@@ -0,0 +1,110 @@
+import heapq
+import numpy as np
+from routingGrid import TRAVERSABLE, SearchCancelled
+
+
+# Bidirectional A* with average potentials: both directions rank cells by
+# p(v) = (h_goal(v) - h_start(v)) / 2, added in the forward search and subtracted in the
+# reverse one. Both then search the same graph of reduced costs, which stay non-negative since
+# the scaled Manhattan heuristic is consistent, so the search can stop as soon as the two
+# smallest keys add up to the best meeting cost found. Same cost model as astar: stepping onto
+# a cell costs its move cost, and only traversable cells are stepped onto.
+def bidirectional_astar(grid, start, goal, on_push=None, on_close=None, should_stop=None):
+    if start == goal:
+        return np.array([start], dtype=np.int64)
+    if not TRAVERSABLE[grid.types[goal]]:
+        return None
+
+    neighbor_lists = grid.neighbor_lists()
+    move_costs = grid.move_costs()
+    walkable = TRAVERSABLE[grid.types].tolist()
+    cols = grid.cols
+    start_row, start_col = divmod(start, cols)
+    goal_row, goal_col = divmod(goal, cols)
+    step_cost = grid.min_step_cost()
+
+    # Returns (potential, distance left to goal, distance left to start) for index
+    def potential(index):
+        row, col = divmod(index, cols)
+        to_goal = (abs(goal_col - col) + abs(goal_row - row)) * step_cost
+        to_start = (abs(start_col - col) + abs(start_row - row)) * step_cost
+        return (to_goal - to_start) / 2, to_goal, to_start
+
+    # Cells that can step onto index: traversable neighbors, or the start itself
+    def predecessors(index):
+        if index == start or not walkable[index]:
+            return []
+        return [neighbor for neighbor in grid.adjacent_cells(index) if neighbor == start or walkable[neighbor]]
+
+    g_forward = {start: 0.0}
+    g_reverse = {goal: 0.0}
+    came_from = {start: None}  # Forward tree, towards start
+    leads_to = {goal: None}  # Reverse tree, towards goal
+    closed_forward = set()
+    closed_reverse = set()
+    counter = 0
+    # Entries are (key, distance left, counter, cell); ties go to the cell closer to its target, as in astar
+    p, h, _ = potential(start)
+    open_forward = [(p, h, counter, start)]
+    p, _, h = potential(goal)
+    open_reverse = [(-p, h, counter, goal)]
+    best = float('inf')
+    meeting = None
+
+    while open_forward and open_reverse:
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+        if open_forward[0][0] + open_reverse[0][0] >= best:
+            break
+
+        # Expand the side with the smaller key
+        forward = open_forward[0][0] <= open_reverse[0][0]
+        if forward:
+            _, _, _, current = heapq.heappop(open_forward)
+            if current in closed_forward:
+                continue
+            closed_forward.add(current)
+            g_current = g_forward[current]
+            steps = [(neighbor, move_costs[neighbor]) for neighbor in neighbor_lists[current]]
+            g_score, g_other, tree, open_set, sign = g_forward, g_reverse, came_from, open_forward, 1
+        else:
+            _, _, _, current = heapq.heappop(open_reverse)
+            if current in closed_reverse:
+                continue
+            closed_reverse.add(current)
+            g_current = g_reverse[current]
+            step = move_costs[current]
+            steps = [(neighbor, step) for neighbor in predecessors(current)]
+            g_score, g_other, tree, open_set, sign = g_reverse, g_forward, leads_to, open_reverse, -1
+
+        for neighbor, cost in steps:
+            temp_g_score = g_current + cost
+            if temp_g_score < g_score.get(neighbor, float('inf')):
+                g_score[neighbor] = temp_g_score
+                tree[neighbor] = current
+                counter += 1
+                p, to_goal, to_start = potential(neighbor)
+                heapq.heappush(open_set, (temp_g_score + sign * p, to_goal if forward else to_start, counter, neighbor))
+                if on_push is not None:
+                    on_push(neighbor)
+                if neighbor in g_other and temp_g_score + g_other[neighbor] < best:
+                    best = temp_g_score + g_other[neighbor]
+                    meeting = neighbor
+
+        if on_close is not None:
+            on_close(current)
+
+    if meeting is None:
+        return None
+
+    path = []
+    index = meeting
+    while index is not None:
+        path.append(index)
+        index = came_from[index]
+    path.reverse()
+    index = leads_to[meeting]
+    while index is not None:
+        path.append(index)
+        index = leads_to[index]
+    return np.array(path, dtype=np.int64)
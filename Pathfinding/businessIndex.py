@@ -0,0 +1,117 @@
+import math
+import numpy as np
+
+# Buckets are sized so each holds about this many businesses on average
+BUCKET_OCCUPANCY = 4
+MIN_BUCKET_SIZE = 4
+
+
+# Uniform bucket grid over business locations for nearest, radius and viewport queries by
+# grid position. Businesses are sorted by bucket, and the buckets of one bucket row are
+# contiguous in that order, so a query reads one slice per bucket row it covers. Results are
+# (business number, distance in cells) with business numbers indexing the businesses list.
+class BusinessIndex:
+    def __init__(self, businesses):
+        self.businesses = list(businesses)
+        count = len(self.businesses)
+        self.xs = np.array([int(x) for _, x, _, _ in self.businesses], dtype=np.int64)
+        self.ys = np.array([int(y) for _, _, y, _ in self.businesses], dtype=np.int64)
+        self.scores = np.array([float(score) for _, _, _, score in self.businesses], dtype=np.float64)
+
+        rows = int(self.ys.max()) + 1 if count else 1
+        cols = int(self.xs.max()) + 1 if count else 1
+        self.bucket_size = max(MIN_BUCKET_SIZE, math.ceil(math.sqrt(rows * cols * BUCKET_OCCUPANCY / max(count, 1))))
+        self.bucket_rows = -(-rows // self.bucket_size)
+        self.bucket_cols = -(-cols // self.bucket_size)
+
+        buckets = (self.ys // self.bucket_size) * self.bucket_cols + self.xs // self.bucket_size
+        self.order = np.argsort(buckets, kind='stable')
+        self.starts = np.searchsorted(buckets[self.order], np.arange(self.bucket_rows * self.bucket_cols + 1))
+        # Per-business arrays in bucket order, so a slice of buckets is a slice of these
+        self.sorted_xs = self.xs[self.order]
+        self.sorted_ys = self.ys[self.order]
+        self.sorted_scores = self.scores[self.order]
+
+    def __len__(self):
+        return len(self.businesses)
+
+    # Positions (into the bucket order) of businesses in bucket rows first..last, columns first..last
+    def _slices(self, first_row, last_row, first_col, last_col):
+        first_row, last_row = max(first_row, 0), min(last_row, self.bucket_rows - 1)
+        first_col, last_col = max(first_col, 0), min(last_col, self.bucket_cols - 1)
+        if first_row > last_row or first_col > last_col:
+            return []
+        slices = []
+        for bucket_row in range(first_row, last_row + 1):
+            start = self.starts[bucket_row * self.bucket_cols + first_col]
+            end = self.starts[bucket_row * self.bucket_cols + last_col + 1]
+            if start < end:
+                slices.append(np.arange(start, end))
+        return slices
+
+    def _candidates(self, first_row, last_row, first_col, last_col):
+        slices = self._slices(first_row, last_row, first_col, last_col)
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+    # Businesses in the bucket ring at Chebyshev distance ring around (bucket_row, bucket_col)
+    def _ring(self, bucket_row, bucket_col, ring):
+        if ring == 0:
+            return self._candidates(bucket_row, bucket_row, bucket_col, bucket_col)
+        parts = self._slices(bucket_row - ring, bucket_row - ring, bucket_col - ring, bucket_col + ring)
+        parts += self._slices(bucket_row + ring, bucket_row + ring, bucket_col - ring, bucket_col + ring)
+        parts += self._slices(bucket_row - ring + 1, bucket_row + ring - 1, bucket_col - ring, bucket_col - ring)
+        parts += self._slices(bucket_row - ring + 1, bucket_row + ring - 1, bucket_col + ring, bucket_col + ring)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _results(self, positions, distances):
+        order = np.argsort(distances, kind='stable')
+        return [(int(self.order[position]), float(distance)) for position, distance in zip(positions[order], distances[order])]
+
+    # The k businesses closest to (row, col), nearest first. Rings of buckets are searched
+    # outwards until no unsearched bucket can hold anything closer than the k-th found.
+    def nearest(self, row, col, k=1):
+        if not self.businesses or k <= 0:
+            return []
+        size = self.bucket_size
+        bucket_row = min(max(row // size, 0), self.bucket_rows - 1)
+        bucket_col = min(max(col // size, 0), self.bucket_cols - 1)
+        last_ring = max(bucket_row, self.bucket_rows - 1 - bucket_row, bucket_col, self.bucket_cols - 1 - bucket_col)
+        positions = []
+        distances = []
+        for ring in range(last_ring + 1):
+            found = self._ring(bucket_row, bucket_col, ring)
+            if found.size:
+                positions.append(found)
+                distances.append(np.hypot(self.sorted_ys[found] - row, self.sorted_xs[found] - col))
+            if sum(part.size for part in positions) >= k:
+                kth = np.partition(np.concatenate(distances), k - 1)[k - 1]
+                # Distance from (row, col) to the nearest cell outside the searched square
+                reach = min(row - (bucket_row - ring) * size, (bucket_row + ring + 1) * size - 1 - row,
+                            col - (bucket_col - ring) * size, (bucket_col + ring + 1) * size - 1 - col) + 1
+                if kth <= reach:
+                    break
+        if not positions:
+            return []
+        return self._results(np.concatenate(positions), np.concatenate(distances))[:k]
+
+    # Every business within radius cells of (row, col), nearest first
+    def within(self, row, col, radius):
+        size = self.bucket_size
+        found = self._candidates(int((row - radius) // size), int((row + radius) // size),
+                                 int((col - radius) // size), int((col + radius) // size))
+        distances = np.hypot(self.sorted_ys[found] - row, self.sorted_xs[found] - col)
+        inside = distances <= radius
+        return self._results(found[inside], distances[inside])
+
+    # Business numbers in the rectangle of rows first_row..last_row and columns first_col..last_col
+    # (e.g. the visible part of the grid) scoring at least min_score, best score first
+    def in_rect(self, first_row, first_col, last_row, last_col, min_score=-math.inf):
+        size = self.bucket_size
+        found = self._candidates(first_row // size, last_row // size, first_col // size, last_col // size)
+        ys = self.sorted_ys[found]
+        xs = self.sorted_xs[found]
+        scores = self.sorted_scores[found]
+        keep = (ys >= first_row) & (ys <= last_row) & (xs >= first_col) & (xs <= last_col) & (scores >= min_score)
+        found = found[keep]
+        order = np.argsort(-scores[keep], kind='stable')
+        return [int(self.order[position]) for position in found[order]]
@@ -17,6 +17,22 @@ class BusinessPicker(QWidget):
 		self.pathfind_button = QPushButton("Pathfind")
 		self.pathfind_button.clicked.connect(self.pathfind)
 
+		# Nearest Button, needs a precomputed business table
+		self.nearest_button = QPushButton("Pathfind to Nearest")
+		self.nearest_button.clicked.connect(self.pathfind_nearest)
+
+		# Spatial queries around the start cell and over the visible part of the grid
+		self.query_input = QLineEdit()
+		self.query_input.setPlaceholderText("Count, radius or minimum score")
+		self.nearby_button = QPushButton("Closest to Start")
+		self.nearby_button.clicked.connect(self.show_nearest)
+		self.radius_button = QPushButton("Within Radius of Start")
+		self.radius_button.clicked.connect(self.show_within)
+		self.visible_button = QPushButton("Scoring Above in View")
+		self.visible_button.clicked.connect(self.show_visible)
+		self.results = QListWidget()
+		self.results.itemClicked.connect(self.choose_result)
+
 		# Layout Setup
 		self.layout = QVBoxLayout(self)
 		self.layout.addWidget(QLabel("Start Business:"))
@@ -24,6 +40,12 @@ class BusinessPicker(QWidget):
 		self.layout.addWidget(QLabel("End Business:"))
 		self.layout.addWidget(self.pathfind_to)
 		self.layout.addWidget(self.pathfind_button)
+		self.layout.addWidget(self.nearest_button)
+		self.layout.addWidget(self.query_input)
+		self.layout.addWidget(self.nearby_button)
+		self.layout.addWidget(self.radius_button)
+		self.layout.addWidget(self.visible_button)
+		self.layout.addWidget(self.results)
 
 		self.update_list()  # Update list after setting up widgets
 
@@ -36,14 +58,14 @@ class BusinessPicker(QWidget):
 			self.pathfind_from.addItems(business_names)
 			self.pathfind_to.addItems(business_names)
 
+	# Strips the score part of the name from a dropdown entry
+	def selected_name(self, dropdown):
+		return dropdown.currentText().strip().rsplit(" (Score:", 1)[0]
+
 	def pathfind(self):
 		# Get to and from names
-		business_start_name_raw = self.pathfind_from.currentText().strip()
-		business_end_name_raw = self.pathfind_to.currentText().strip()
-
-		# Strip the score part of the name from the dropdown
-		business_start_name = business_start_name_raw.rsplit(" (Score:", 1)[0]
-		business_end_name = business_end_name_raw.rsplit(" (Score:", 1)[0]
+		business_start_name = self.selected_name(self.pathfind_from)
+		business_end_name = self.selected_name(self.pathfind_to)
 
 		# Use parent's business_dict
 		start_coords = self.parent.business_dict[business_start_name]
@@ -55,3 +77,62 @@ class BusinessPicker(QWidget):
 
 		# Now run pathfinding
 		self.parent.find_path()
+
+	# Routes from the start business to the closest other business it can reach
+	def pathfind_nearest(self):
+		table = self.parent.business_table
+		if table is None or not table.valid:
+			print("No business table for this grid, build one with businessTable.py")
+			return
+
+		start_coords = self.parent.business_dict[self.selected_name(self.pathfind_from)]
+		start = self.parent.routing_grid.index(start_coords[1], start_coords[0])
+		nearest = table.nearest(start)
+		if not nearest:
+			print("No other business is reachable")
+			return
+
+		row, distance = nearest[0]
+		print(f"Nearest business: {self.parent.businesses[row][0]} ({distance:.1f})")
+		self.pathfind_to.setCurrentIndex(row)
+		self.pathfind()
+
+	# Number typed into the query box, or default if it is empty or not a number
+	def query_value(self, default):
+		try:
+			return float(self.query_input.text())
+		except ValueError:
+			return default
+
+	# Lists businesses as (business number, distance or None); clicking one makes it the end business
+	def show_results(self, found):
+		self.results.clear()
+		for number, distance in found:
+			name, _, _, score = self.parent.businesses[number]
+			text = f"{name} (Score: {score})" if distance is None else f"{name} (Score: {score}) {distance:.1f} cells away"
+			item = QListWidgetItem(text)
+			item.setData(Qt.UserRole, number)
+			self.results.addItem(item)
+
+	def choose_result(self, item):
+		self.pathfind_to.setCurrentIndex(item.data(Qt.UserRole))
+
+	def start_cell(self):
+		if self.parent.start is None:
+			print("Place a start cell first")
+		return self.parent.start
+
+	def show_nearest(self):
+		start = self.start_cell()
+		if start is not None:
+			self.show_results(self.parent.business_index.nearest(start.row, start.col, int(self.query_value(5))))
+
+	def show_within(self):
+		start = self.start_cell()
+		if start is not None:
+			self.show_results(self.parent.business_index.within(start.row, start.col, self.query_value(20)))
+
+	def show_visible(self):
+		first_row, first_col, last_row, last_col = self.parent.visible_cells()
+		found = self.parent.business_index.in_rect(first_row, first_col, last_row, last_col, self.query_value(float('-inf')))
+		self.show_results([(number, None) for number in found])
@@ -0,0 +1,198 @@
+import argparse
+import os
+import numpy as np
+from routingGrid import RoutingGrid, TRAVERSABLE, TYPE_CODES, dijkstra
+from routeOptimizer import shared_pool
+from gridBinary import BINARY_EXTENSION, read_grid, write_grid
+
+# Extra .navgrid layers holding the table
+DISTANCE_LAYER = "business_distances"
+HOP_LAYER = "business_hops"
+
+# Predecessor codes in HOP_LAYER: 0 marks the source (or an unreached cell), otherwise the step
+# back towards the source is DOWN, UP, RIGHT or LEFT, matching the adjacency order
+NO_HOP = 0
+
+
+def _hop_steps(cols):
+    return (0, cols, -cols, 1, -1)
+
+
+# Packs a came_from array into one predecessor code per cell
+def _hop_codes(came_from, cols):
+    steps = came_from.astype(np.int64) - np.arange(came_from.size)
+    codes = np.zeros(came_from.size, dtype=np.uint8)
+    for code, step in enumerate(_hop_steps(cols)):
+        if code != NO_HOP:
+            codes[steps == step] = code
+    codes[came_from == -1] = NO_HOP
+    return codes
+
+
+# Worker side: one Dijkstra per source business, stopping once every business is settled
+def _table_chunk(rows, cols, types, costs, sources, targets):
+    grid = RoutingGrid(rows, cols, types, costs)
+    results = []
+    for source in sources:
+        distances, came_from = dijkstra(grid, source, targets)
+        results.append((distances[targets].astype(np.float32), _hop_codes(came_from, cols)))
+    return results
+
+
+# All-pairs route costs between a map's businesses plus, per source business, a predecessor
+# code for every cell, so business-to-business routes are unrolled instead of searched.
+# The table describes the grid it was built from; it is invalid while any cell's cost or
+# traversability differs from that grid.
+class BusinessTable:
+    def __init__(self, grid, businesses, distances, hops):
+        self.businesses = businesses
+        self.cols = grid.cols
+        self.cells = np.array([grid.index(y, x) for _, x, y, _ in businesses], dtype=np.int64)
+        self.rows_by_cell = {}  # Cell index -> table row, first business wins on shared cells
+        for row, cell in enumerate(self.cells.tolist()):
+            self.rows_by_cell.setdefault(cell, row)
+        self.scores = np.array([score for _, _, _, score in businesses], dtype=np.float64)
+        self.distances = distances  # (businesses, businesses) float32, inf if unreachable
+        self.hops = hops  # (businesses, cells) uint8 predecessor codes
+        self.valid = True
+        self.built_walkable = None  # Layers the table was built from, kept by attach
+        self.built_costs = None
+        self.mismatched = set()  # Cells that currently differ from them
+
+    # Runs one Dijkstra per business, split across the process pool
+    @classmethod
+    def build(cls, grid, businesses, workers=None):
+        cells = [grid.index(y, x) for _, x, y, _ in businesses]
+        targets = np.array(cells, dtype=np.int64)
+        workers = workers if workers is not None else os.cpu_count() or 1
+        if workers <= 1:
+            row_chunks = [list(range(len(cells)))]
+            results = [_table_chunk(grid.rows, grid.cols, grid.types, grid.costs, cells, targets)]
+        else:
+            row_chunks = [list(range(i, len(cells), workers)) for i in range(min(workers, len(cells)))]
+            pool = shared_pool()
+            futures = [pool.submit(_table_chunk, grid.rows, grid.cols, grid.types, grid.costs, [cells[row] for row in rows], targets) for rows in row_chunks]
+            results = [future.result() for future in futures]
+
+        distances = np.empty((len(cells), len(cells)), dtype=np.float32)
+        hops = np.empty((len(cells), grid.size), dtype=np.uint8)
+        for rows, chunk_results in zip(row_chunks, results):
+            for row, (distance_row, hop_row) in zip(rows, chunk_results):
+                distances[row] = distance_row
+                hops[row] = hop_row
+        return cls(grid, businesses, distances, hops)
+
+    # Table stored in a .navgrid file's extra layers, or None if the file has none (or a stale one)
+    @classmethod
+    def from_layers(cls, grid, businesses, layers):
+        distances = layers.get(DISTANCE_LAYER)
+        hops = layers.get(HOP_LAYER)
+        if distances is None or hops is None:
+            return None
+        if distances.shape != (len(businesses), len(businesses)) or hops.shape != (len(businesses), grid.size):
+            print("Ignoring business table that doesn't match the grid")
+            return None
+        return cls(grid, businesses, distances, hops)
+
+    def layers(self):
+        return {DISTANCE_LAYER: self.distances, HOP_LAYER: self.hops}
+
+    # Follows edits to grid, which must still match the layers the table was built from
+    def attach(self, grid):
+        self.grid = grid
+        self.built_walkable = self.walkable(grid, np.arange(grid.size))
+        self.built_costs = grid.costs.copy()
+        self.mismatched = set()
+        self.valid = True
+        grid.edit_listeners.append(self.invalidate)
+
+    # Routes leave from the start marker, so it counts as the cell it was placed on. Street
+    # names aren't compared, the table doesn't depend on them.
+    @staticmethod
+    def walkable(grid, cells):
+        types = grid.types[cells]
+        return TRAVERSABLE[types] | (types == TYPE_CODES['start'])
+
+    # Edit listener: the table is valid again once every edited cell is back to how it was built
+    def invalidate(self, index):
+        grid = self.grid
+        cells = np.arange(grid.size) if index is None else np.atleast_1d(index)
+        differs = (self.walkable(grid, cells) != self.built_walkable[cells]) | (grid.costs[cells] != self.built_costs[cells])
+        if index is None:
+            self.mismatched = set(cells[differs].tolist())
+        else:
+            self.mismatched.difference_update(cells[~differs].tolist())
+            self.mismatched.update(cells[differs].tolist())
+        self.valid = not self.mismatched
+
+    # Route cost between two business cells, or None if either isn't a business in the table
+    def distance(self, start, goal):
+        source = self.rows_by_cell.get(int(start))
+        target = self.rows_by_cell.get(int(goal))
+        if not self.valid or source is None or target is None:
+            return None
+        return float(self.distances[source, target])
+
+    # Route between two business cells as an index array (start and goal included) by following
+    # the predecessor codes back from goal. None if the pair isn't in the table or is unreachable.
+    def route(self, start, goal):
+        distance = self.distance(start, goal)
+        if distance is None or not np.isfinite(distance):
+            return None
+        hops = self.hops[self.rows_by_cell[int(start)]]
+        steps = _hop_steps(self.cols)
+        start = int(start)
+        cell = int(goal)
+        path = [cell]
+        while cell != start:
+            code = hops[cell]
+            if code == NO_HOP:
+                return None
+            cell += steps[code]
+            path.append(cell)
+        path.reverse()
+        return np.array(path, dtype=np.int64)
+
+    # Closest reachable businesses by route cost from a business cell, as (row, distance) pairs.
+    # min_score skips businesses scored below it.
+    def nearest(self, start, count=1, min_score=None):
+        source = self.rows_by_cell.get(int(start))
+        if not self.valid or source is None:
+            return []
+        distances = self.distances[source].astype(np.float64)
+        candidates = np.isfinite(distances) & (self.cells != self.cells[source])
+        if min_score is not None:
+            candidates &= self.scores >= min_score
+        rows = np.flatnonzero(candidates)
+        rows = rows[np.argsort(distances[rows], kind='stable')[:count]]
+        return [(int(row), float(distances[row])) for row in rows]
+
+
+# Offline build step: adds the table to a .navgrid file (converting CSV grids first)
+def build_table_file(grid_path, output_path=None, workers=None):
+    if grid_path.endswith(BINARY_EXTENSION):
+        grid, businesses, layers = read_grid(grid_path, mode='r')
+    else:
+        grid, businesses = RoutingGrid.from_csv(grid_path)
+        layers = {}
+    output_path = output_path or os.path.splitext(grid_path)[0] + BINARY_EXTENSION
+
+    table = BusinessTable.build(grid, businesses, workers)
+    layers.update(table.layers())
+    # Write beside the output first, the source may be the same memory-mapped file
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    write_grid(temp_path, grid, businesses, layers)
+    del grid, layers
+    os.replace(temp_path, output_path)
+    reachable = np.isfinite(table.distances).sum() - len(businesses)
+    print(f"Business table for {len(businesses)} businesses ({reachable} reachable pairs) written to {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute business-to-business routes into a .navgrid file")
+    parser.add_argument("grid_files", nargs="+", help="CSV or .navgrid grids, each written to a .navgrid next to its source")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: one per core)")
+    args = parser.parse_args()
+    for grid_path in args.grid_files:
+        build_table_file(grid_path, workers=args.workers)
@@ -0,0 +1,135 @@
+import csv
+import os
+from contextlib import contextmanager
+import numpy as np
+from routingGrid import COST_SCALE
+
+# Written by Datascraping/scrape.py, run from the repository root
+SCORES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'street_accessibility_scores.csv')
+SCORE_COLUMN = "score"
+# Scored separately per side of Fifth Avenue but drawn on the map without the side
+STREET_SIDES = ("East ", "West ")
+
+# The costs typed into the map by hand
+MANUAL_PROFILE = "manual"
+# Score of a street with nothing left to improve; every point below it adds to the street's cost
+REFERENCE_SCORE = 110.0
+# How strongly each mobility profile avoids poorly scored streets. A profile uses the scores
+# file's column of the same name when it has one, and the overall score otherwise.
+PROFILE_WEIGHTS = {
+    "manual_wheelchair": 4.0,
+    "power_wheelchair": 2.0,
+    "walker": 1.0,
+}
+COST_PROFILES = [MANUAL_PROFILE] + list(PROFILE_WEIGHTS)
+
+
+# Reads the street scores CSV into {column: {street name: score}}, empty if the file is missing.
+# "East 125th St" and "West 125th St" also score "125th St" with their mean.
+def load_street_scores(file_path=SCORES_FILE):
+    if not os.path.exists(file_path):
+        print(f"No street scores at {file_path}, only the manual cost profile is available")
+        return {}
+    scores = {}
+    with open(file_path, 'r', newline='') as file:
+        for row in csv.DictReader(file):
+            name = row.pop("Street Name", "").strip()
+            for column, value in row.items():
+                try:
+                    scores.setdefault(column, {})[name] = float(value)
+                except (TypeError, ValueError):
+                    pass
+
+    for column in scores.values():
+        sides = {}
+        for name, score in column.items():
+            if name.startswith(STREET_SIDES):
+                sides.setdefault(name.split(" ", 1)[1], []).append(score)
+        for name, side_scores in sides.items():
+            column.setdefault(name, sum(side_scores) / len(side_scores))
+    return scores
+
+
+# One cost array per routing profile for a grid, built by joining the street scores onto the
+# grid's street id layer. Switching profiles copies that profile's array into grid.costs.
+# Cells on unscored or unnamed streets keep their manual cost in every profile.
+class CostProfiles:
+    def __init__(self, grid, scores):
+        self.grid = grid
+        self.scores = scores
+        self.active = MANUAL_PROFILE
+        self.manual = grid.costs.copy()
+        self.costs = {MANUAL_PROFILE: self.manual}  # Profile -> float32 cost per cell
+        self.tables = {}  # Profile -> float64 cost per street id, NaN for unscored streets
+        self.applying = False  # Set while on_edit writes the active profile's costs back to the grid
+        self.build()
+        grid.edit_listeners.append(self.on_edit)
+
+    def street_table(self, profile):
+        column = self.scores.get(profile, self.scores.get(SCORE_COLUMN, {}))
+        scores = np.array([column.get(name, np.nan) for name in self.grid.street_names], dtype=np.float64)
+        scores[0] = np.nan  # Unnamed cells
+        deficit = np.maximum(REFERENCE_SCORE - scores, 0.0)
+        return COST_SCALE * (1.0 + PROFILE_WEIGHTS[profile] * deficit / REFERENCE_SCORE)
+
+    def build(self):
+        self.tables = {profile: self.street_table(profile) for profile in PROFILE_WEIGHTS}
+        for profile, table in self.tables.items():
+            by_cell = table[self.grid.street_ids]
+            self.costs[profile] = np.where(np.isnan(by_cell), self.manual, by_cell).astype(np.float32)
+
+    # Street names with no score, for checking the join
+    def unscored_streets(self):
+        table = self.tables.get(next(iter(PROFILE_WEIGHTS)))
+        if table is None:
+            return []
+        return [name for name, cost in zip(self.grid.street_names[1:], table[1:].tolist()) if np.isnan(cost)]
+
+    def activate(self, profile):
+        if profile == self.active:
+            return
+        self.active = profile
+        self.grid.set_costs(self.costs[profile])
+
+    # Keeps every profile in step with cell edits. A cost that differs from the active profile's
+    # was typed and becomes the cell's manual cost; anything else (a type paint or street rename
+    # sending back the displayed cost) leaves the manual cost alone. On a scored street while a
+    # mobility profile is active the score still decides, and the typed cost applies once the
+    # manual profile is back.
+    def on_edit(self, index):
+        if index is None or self.applying:
+            return
+        grid = self.grid
+        cells = np.atleast_1d(index)
+        street_ids = grid.street_ids[cells]
+        if street_ids.max() >= len(next(iter(self.tables.values()))):
+            self.tables = {profile: self.street_table(profile) for profile in PROFILE_WEIGHTS}  # New street name
+        typed = cells[grid.costs[cells] != self.costs[self.active][cells]]
+        self.manual[typed] = grid.costs[typed]
+        for profile, table in self.tables.items():
+            costs = table[street_ids]
+            self.costs[profile][cells] = np.where(np.isnan(costs), self.manual[cells], costs)
+
+        costs = self.costs[self.active][cells]
+        differs = grid.costs[cells] != costs
+        overridden = np.count_nonzero(grid.costs[typed] != self.costs[self.active][typed])
+        if overridden:
+            print(f"Saved the cost of {overridden} cells on scored streets as their manual cost; "
+                  f"the {self.active} profile sets them from the street scores")
+        if differs.any():
+            self.applying = True
+            try:
+                grid.set_costs(costs[differs], cells[differs])
+            finally:
+                self.applying = False
+
+    # Shows the manual costs as the grid's costs for the duration, without notifying listeners,
+    # so exported maps keep their hand-entered costs whichever profile is active
+    @contextmanager
+    def manual_costs(self):
+        costs = self.grid.costs
+        self.grid.costs = self.manual
+        try:
+            yield
+        finally:
+            self.grid.costs = costs
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_FOLDER = 'Pathfinding/cache/'
+DEFAULT_TTL = 30 * 24 * 60 * 60  # Seconds before a cached response is regenerated
+DEFAULT_MAX_ENTRIES = 1000
+
+
+# Disk-backed cache of generated directions. Each response is one JSON file named by the sha1
+# of its request (like DataCollection/cache). File mtimes double as the LRU order, so a hit
+# touches the file and eviction removes the oldest files first.
+class DirectionsCache:
+    def __init__(self, folder_path=DEFAULT_FOLDER, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.folder_path = folder_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(model, system_message, prompt_template, route_text):
+        request = json.dumps([model, system_message, prompt_template, route_text])
+        return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder_path, f"{key}.json")
+
+    # Returns the cached text, or None if missing or older than the TTL
+    def get(self, key):
+        file_path = self.path(key)
+        try:
+            with open(file_path, 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.remove(key)
+            return None
+        try:
+            os.utime(file_path)  # Mark as recently used
+        except OSError:
+            pass
+        return entry["response"]
+
+    def put(self, key, response, model=None):
+        os.makedirs(self.folder_path, exist_ok=True)
+        file_path = self.path(key)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({"created": time.time(), "model": model, "response": response}, file)
+        os.replace(temp_path, file_path)  # Atomic, so readers never see a partial file
+        self.evict()
+
+    def remove(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    # Drops the least recently used files beyond max_entries
+    def evict(self):
+        if self.max_entries is None:
+            return
+        entries = []
+        for file_name in os.listdir(self.folder_path):
+            if file_name.endswith('.json'):
+                file_path = os.path.join(self.folder_path, file_name)
+                try:
+                    entries.append((os.path.getmtime(file_path), file_path))
+                except OSError:
+                    pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, file_path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
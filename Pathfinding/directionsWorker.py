@@ -0,0 +1,71 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import threading
+from AIAPI import AIAPI
+from pathWorker import CancellationToken
+
+
+class DirectionsJob:
+    def __init__(self, job_id, route_text):
+        self.job_id = job_id
+        self.route_text = route_text
+        self.token = CancellationToken()
+
+
+# Streams polished directions from OpenAI off the GUI thread. Like PathWorker, only the latest
+# request matters: submitting cancels the stream in progress and replaces any waiting request.
+class DirectionsWorker(QThread):
+    token = pyqtSignal(int, str)  # job id, next chunk of text
+    directionsFinished = pyqtSignal(int, object)  # job id, full text or None if it failed or was cancelled
+
+    def __init__(self, client=None):
+        super().__init__()
+        self.client = client  # Optional stand-in for the shared OpenAI client
+        self.condition = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.next_job_id = 0
+        self.shutting_down = False
+
+    def submit(self, route_text):
+        with self.condition:
+            self.next_job_id += 1
+            job = DirectionsJob(self.next_job_id, route_text)
+            if self.current is not None:
+                self.current.token.cancel()
+            self.pending = job
+            self.condition.notify()
+        if not self.isRunning():
+            self.start()
+        return job.job_id
+
+    def shutdown(self):
+        with self.condition:
+            self.shutting_down = True
+            if self.current is not None:
+                self.current.token.cancel()
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.shutting_down:
+                    self.condition.wait()
+                if self.shutting_down:
+                    return
+                job = self.current = self.pending
+                self.pending = None
+
+            try:
+                response = AIAPI(client=self.client).getAPIResponse(
+                    job.route_text,
+                    on_token=lambda text: self.token.emit(job.job_id, text),
+                    should_stop=lambda: job.token.cancelled
+                )
+            except Exception as e:
+                print(f"Error generating directions: {e}")
+                response = None
+            self.directionsFinished.emit(job.job_id, response)
+
+            with self.condition:
+                self.current = None
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import struct
+import numpy as np
+from routingGrid import RoutingGrid
+
+# .navgrid layout: MAGIC, uint32 header length, UTF-8 JSON header, then the raw little-endian
+# layers, each aligned to LAYER_ALIGNMENT bytes so they can be memory-mapped in place.
+# The header holds the grid size, the street name table, the business table and, per layer,
+# its dtype, shape and offset from the start of the layer data.
+MAGIC = b"NAVGRID1"
+BINARY_EXTENSION = ".navgrid"
+LAYER_ALIGNMENT = 64
+CORE_LAYERS = {"types": "<u1", "costs": "<f4", "street_ids": "<u2"}
+MAX_STREETS = np.iinfo(np.uint16).max + 1  # Street ids are stored as uint16
+
+
+def _align(offset):
+    return -(-offset // LAYER_ALIGNMENT) * LAYER_ALIGNMENT
+
+
+# Writes a routing grid and its businesses. extra_layers maps names to arrays stored alongside
+# the core layers (e.g. precomputed tables) and handed back by read_grid.
+def write_grid(file_path, grid, businesses, extra_layers=None):
+    if len(grid.street_names) > MAX_STREETS:
+        raise ValueError(f"{len(grid.street_names)} street names don't fit the {BINARY_EXTENSION} format's limit of {MAX_STREETS}")
+    layers = {name: np.ascontiguousarray(getattr(grid, name), dtype=dtype) for name, dtype in CORE_LAYERS.items()}
+    for name, array in (extra_layers or {}).items():
+        array = np.ascontiguousarray(array)
+        layers[name] = array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+    layer_specs = {}
+    offset = 0
+    for name, array in layers.items():
+        offset = _align(offset)
+        layer_specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = json.dumps({
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "street_names": grid.street_names,
+        "businesses": [[name, x, y, score] for name, x, y, score in businesses],
+        "layers": layer_specs
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    # The layers may be memory-mapped from file_path itself (e.g. re-exporting an imported map),
+    # so write a temporary file and swap it in rather than truncating the mapped one
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<I', len(header)))
+        file.write(header)
+        for name, array in layers.items():
+            file.write(b"\0" * (data_start + layer_specs[name]["offset"] - file.tell()))
+            file.write(array.tobytes())
+    try:
+        os.replace(temp_path, file_path)
+    except PermissionError:
+        # Windows won't replace a file that is open or mapped, see in_memory
+        os.remove(temp_path)
+        raise PermissionError(f"Can't replace {file_path}, it is still open or memory-mapped")
+
+
+# array copied into memory if it is memory-mapped from file_path, otherwise array itself.
+# Arrays mapped from a file must be let go of before write_grid can replace it on Windows.
+def in_memory(array, file_path):
+    filename = getattr(array, 'filename', None)
+    if filename is not None and os.path.normcase(filename) == os.path.normcase(os.path.abspath(file_path)):
+        return np.array(array)
+    return array
+
+
+# Loads a .navgrid file without copying the layers. mode is the numpy.memmap mode; the default
+# copy-on-write mode lets the grid be edited in memory without touching the file.
+# Returns (grid, businesses, extra_layers).
+def read_grid(file_path, mode='c'):
+    with open(file_path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{file_path} is not a {BINARY_EXTENSION} file")
+        (header_length,) = struct.unpack('<I', file.read(4))
+        header = json.loads(file.read(header_length).decode('utf-8'))
+    data_start = _align(len(MAGIC) + 4 + header_length)
+
+    layers = {}
+    for name, spec in header["layers"].items():
+        shape = tuple(spec["shape"])
+        if np.prod(shape) == 0:
+            layers[name] = np.zeros(shape, dtype=spec["dtype"])
+        else:
+            layers[name] = np.memmap(file_path, dtype=spec["dtype"], mode=mode, offset=data_start + spec["offset"], shape=shape)
+
+    grid = RoutingGrid(
+        header["rows"], header["cols"],
+        types=layers.pop("types"),
+        costs=layers.pop("costs"),
+        street_ids=layers.pop("street_ids"),
+        street_names=header["street_names"]
+    )
+    businesses = [(name, int(x), int(y), float(score)) for name, x, y, score in header["businesses"]]
+    return grid, businesses, layers
+
+
+# One-shot converter from exported CSV grids
+def convert_csv(csv_path, output_path=None):
+    output_path = output_path or os.path.splitext(csv_path)[0] + BINARY_EXTENSION
+    grid, businesses = RoutingGrid.from_csv(csv_path)
+    write_grid(output_path, grid, businesses)
+    print(f"Converted {csv_path} -> {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert exported CSV grids to the binary .navgrid format")
+    parser.add_argument("csv_files", nargs="+", help="CSV grids to convert, each written next to its source")
+    args = parser.parse_args()
+    for csv_path in args.csv_files:
+        convert_csv(csv_path)
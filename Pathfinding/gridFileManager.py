@@ -3,6 +3,10 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 import os
 import csv
+from routingGrid import RoutingGrid
+from gridBinary import BINARY_EXTENSION, CORE_LAYERS, in_memory, read_grid, write_grid
+from businessTable import BusinessTable
+from businessIndex import BusinessIndex
 
 class GridFileManager:
 
@@ -38,12 +42,42 @@ class GridFileManager:
     def update_file_list(self):
         self.file_selector.clear()
         if os.path.exists(self.folder_path):
-            csv_files = [f for f in os.listdir(self.folder_path) if f.endswith('.csv')]
-            self.file_selector.addItems(csv_files)
+            grid_files = [f for f in os.listdir(self.folder_path) if f.endswith('.csv') or f.endswith(BINARY_EXTENSION)]
+            self.file_selector.addItems(grid_files)
 
-    # Exports current grid as filename
+    # Exports current grid as filename, in the binary format if it ends with .navgrid and as CSV otherwise.
+    # Cells keep their manual costs whichever cost profile is active.
     def export_grid(self):
+        self.release_file(os.path.join(self.folder_path, self.file_selector.currentText().strip()))
+        with self.parent.cost_profiles.manual_costs():
+            self.write_grid_file()
+
+    # Copies the layers memory-mapped from file_path into memory, so saving over the map the grid
+    # was imported from can replace the file
+    def release_file(self, file_path):
+        grid = self.parent.routing_grid
+        for name in CORE_LAYERS:
+            setattr(grid, name, in_memory(getattr(grid, name), file_path))
+        table = self.parent.business_table
+        if table is not None:
+            table.distances = in_memory(table.distances, file_path)
+            table.hops = in_memory(table.hops, file_path)
+
+    def write_grid_file(self):
         file_name = self.file_selector.currentText().strip()
+        if file_name.endswith(BINARY_EXTENSION):
+            file_path = os.path.join(self.folder_path, file_name)
+            table = self.parent.business_table
+            extra_layers = table.layers() if table is not None and table.valid else None  # Only while it still matches the grid
+            try:
+                write_grid(file_path, self.parent.routing_grid, self.parent.businesses, extra_layers)
+            except (OSError, ValueError) as error:
+                print(f"Error exporting grid: {error}")
+                return
+            print(f"Grid exported to {file_path}")
+            self.update_file_list()
+            return
+
         if not file_name.endswith('.csv'):
             file_name += '.csv'
         file_path = os.path.join(self.folder_path, file_name)
@@ -75,62 +109,35 @@ class GridFileManager:
             print("File not found!")
             return
 
-        with open(file_path, 'r') as file:
-            lines = list(csv.reader(file))
-            businesses_line = lines[0]
-            self.parent.businesses = []
-
-            i = 0
-            while i < len(businesses_line):
-                try:
-                    name = businesses_line[i].strip()
-                    x = int(businesses_line[i + 1].strip())
-                    y = int(businesses_line[i + 2].strip())
-                    score = float(businesses_line[i + 3].strip())
-                    if score == 0.0:
-                        print(f"Error business {name} has a score of 0.0")
-                    self.parent.businesses.append((name, x, y, score))
-                except Exception as e:
-                    print(f"Error parsing business at index {i}: {e}")
-                i += 4  # Move to the next set
-            
-            print("Total businesses:", len(self.parent.businesses))
-            self.parent.business_dict = { name: (int(x), int(y), float(score)) for name, x, y, score in self.parent.businesses }
-            self.parent.business_picker.update_list()
-            lines = lines[1:]
-            row_count = len(lines)
-            col_count = len(lines[0]) if lines else 0
-
-            self.parent.createNewGrid(row_count, col_count)
-
-            for row_idx, row in enumerate(lines):
-                for col_idx, cell in enumerate(row):
-                    try:
-                        parts = cell.split(":")
-                        node_type = parts[0]
-                        r, g, b = map(int, parts[1].split(","))
-                        cost = float(parts[2])
-                        street_name = parts[3] if len(parts) > 3 else ""
-
-                        node = self.parent.grid[row_idx][col_idx]
-                        node.type = node_type
-                        node.color = QColor(r, g, b)
-                        node.setBrush(node.color)
-                        node.cost = cost
-                        node.streetName = street_name
-
-                        # Maintain goal/start references
-                        if node_type == 'start':
-                            self.parent.start = node
-                        elif node_type == 'goal':
-                            self.parent.goals.append(node)
-
-                    except Exception as e:
-                        print(f"Error parsing cell [{row_idx},{col_idx}]: {e}")
-
-        self.parent.fake_color()
+        if file_name.endswith(BINARY_EXTENSION):
+            self.import_binary_grid(file_path)
+            return
+
+        # Cells of both renderers are views of the routing grid, so load the arrays directly
+        routing_grid, businesses = RoutingGrid.from_csv(file_path)
+        self.set_businesses(businesses)
+        self.parent.createNewGrid(routing_grid.rows, routing_grid.cols, routing_grid)
+        print(f"Grid imported from {file_path}")
+
+    # Import a grid from the memory-mapped binary format. Colors come from each cell's type.
+    def import_binary_grid(self, file_path):
+        routing_grid, businesses, layers = read_grid(file_path)
+        self.set_businesses(businesses)
+        self.parent.createNewGrid(routing_grid.rows, routing_grid.cols, routing_grid)
+        table = BusinessTable.from_layers(routing_grid, businesses, layers)
+        if table is not None:
+            table.attach(routing_grid)
+            self.parent.business_table = table
+            print(f"Business table loaded for {len(businesses)} businesses")
         print(f"Grid imported from {file_path}")
 
+    def set_businesses(self, businesses):
+        self.parent.businesses = businesses
+        print("Total businesses:", len(self.parent.businesses))
+        self.parent.business_dict = { name: (int(x), int(y), float(score)) for name, x, y, score in self.parent.businesses }
+        self.parent.business_index = BusinessIndex(self.parent.businesses)
+        self.parent.business_picker.update_list()
+
     # Legacy code for import grid from color files for map image quick setup
     def import_color(self):
         file_name = self.file_selector.currentText().strip()
@@ -143,24 +150,24 @@ class GridFileManager:
         
         with open(file_path, 'r') as file:
             lines = list(csv.reader(file))
-            row_count = len(lines)
-            col_count = len(lines[0]) if lines else 0
-            self.parent.createNewGrid(row_count, col_count)
-            for row_idx, row in enumerate(lines):
-                for col_idx, value in enumerate(row):
-                    value = eval(value)
-                    color = QColor(value[0], value[1], value[2]) # R int G int B int values
-                    type = self.flipped[(color.red(), color.green(), color.blue())]
-                    if type in ["reset", 'reset1', 'reset2', 'reset3']:
-                        type = 'reset'
-                    else:
-                        type = 'barrier'
-                    self.parent.grid[row_idx][col_idx].type = type
-                    self.parent.grid[row_idx][col_idx].color = color
-                    self.parent.grid[row_idx][col_idx].cost = 1
-                    self.parent.grid[row_idx][col_idx].accessible = 1
-                    self.parent.grid[row_idx][col_idx].streetName = "Test Street"
-        self.parent.fake_color() # change this to real color to see traversable vs barrier
+        row_count = len(lines)
+        col_count = len(lines[0]) if lines else 0
+        cell_types = []
+        colors = []
+        for row in lines:
+            for value in row:
+                value = eval(value)
+                color = QColor(value[0], value[1], value[2]) # R int G int B int values
+                type = self.flipped[(color.red(), color.green(), color.blue())]
+                cell_types.append('reset' if type in ["reset", 'reset1', 'reset2', 'reset3'] else 'barrier')
+                colors.append(color)
+
+        routing_grid = RoutingGrid(row_count, col_count)
+        routing_grid.load_cells(cell_types, [1] * len(cell_types), ["Test Street"] * len(cell_types))
+        self.parent.createNewGrid(row_count, col_count, routing_grid)
+        # Show the image colors rather than the traversable/barrier types
+        for cell, color in zip((cell for row in self.parent.grid for cell in row), colors):
+            cell.setBrush(color)
         print(f"Grid imported from {file_path}")
 
     # Used to flip the dictionary
@@ -1,143 +1,133 @@
 from PyQt5.QtWidgets import QGraphicsRectItem  # Import for grid cell representation
 from PyQt5.QtCore import Qt  # Import for event handling
 from PyQt5.QtGui import *
+import numpy as np
+from routingGrid import CELL_TYPES
 
-class Node(QGraphicsRectItem):
-    def __init__(self, row, col, width, total_rows, total_cols, parent, cost):
-        super().__init__(0, 0, width, width)  # Initialize a square grid cell
-        
-        # Grid position and parent reference
-        self.parent = parent  # Reference to the main application
-        self.row = row  # Row index
-        self.col = col  # Column index
-        self.total_rows = total_rows  # Total number of rows in the grid
-        self.total_cols = total_cols  # Total number of cols in the grid
-        self.heuristic_to_goal = float("inf")
-        self.f_score = float("inf")
-        self.traversable = ["reset", "goal", "reset1", "reset2", "reset3"]
-        self.streetName = ""
+# Types painted by selecting their color; any other selected color only recolors the cell
+PAINTABLE_TYPES = ["start", "goal", "barrier", "reset3", "reset2", "reset", "path_point", "closed"]
 
-        self.setAcceptHoverEvents(True)  # Enable hover events
-        self.setAcceptedMouseButtons(Qt.LeftButton)  # Accept left clicks
-        
-        # Set graphical properties
-        self.setRect(col * width, row * width, width, width)  # Define cell position and size
-        self.color = self.parent.color_map['reset']  # Default color
-        self.setBrush(self.color)  # Set initial color fill
-
-        # Pathfinding properties
-        self.neighbors = []  # List to store accessible neighboring nodes
-        self.width = width  # Width of each cell
-        self.type = 'reset'  # Default type
-        
-        # Allow selection for user interaction
-        self.setFlag(QGraphicsRectItem.ItemIsSelectable, True)
-        self.setAcceptHoverEvents(True)  # Enable hover events
-        
-        self.cost = cost  # Cost to move into this node
-        self.accessible = True  # Whether the node is traversable (outdated)
+# One brush per color, shared by every cell painted with it
+_brushes = {}
+
+
+def shared_brush(color):
+    rgba = QColor(color).rgba()
+    brush = _brushes.get(rgba)
+    if brush is None:
+        brush = _brushes[rgba] = QBrush(QColor.fromRgba(rgba))
+    return brush
 
-    # For when nodes cost the same
-    def __lt__(self, other):
-        if self.f_score == other.f_score:
-            # Prefer nodes closer to the goal
-            return self.heuristic_to_goal < other.heuristic_to_goal  
-        return False  # Otherwise, priority queue will use f_score by default
+
+# Cell behaviour shared by Node and gridRaster.RasterCell. Type, cost and street name live in
+# the parent's routing grid (a uint8 type code, a float32 cost and an interned street id), so a
+# cell only holds its position; search state lives in the search engines.
+class GridCell:
+    __slots__ = ()
+    accessible = True  # Whether the node is traversable (outdated)
+
+    def _set_cell(self, cell_type=None, cost=None, street_name=None):
+        self.parent.routing_grid.set_cell(
+            self.row, self.col,
+            cell_type if cell_type is not None else self.type,
+            cost if cost is not None else self.cost,
+            street_name if street_name is not None else self.streetName
+        )
+
+    @property
+    def type(self):
+        return CELL_TYPES[self.parent.routing_grid.types[self.index]]
+
+    @type.setter
+    def type(self, cell_type):
+        self._set_cell(cell_type=cell_type)
+
+    @property
+    def cost(self):
+        return float(np.format_float_positional(self.parent.routing_grid.costs[self.index]))
+
+    @cost.setter
+    def cost(self, cost):
+        self._set_cell(cost=cost)
+
+    @property
+    def streetName(self):
+        return self.parent.routing_grid.street_name(self.index)
+
+    @streetName.setter
+    def streetName(self, street_name):
+        self._set_cell(street_name=street_name)
 
     # Resets the node to its default state (empty space)
     def reset(self):
-        self.color = self.parent.color_map['reset']
+        self.setBrush(self.parent.color_map['reset'])
         self.type = 'reset'
-        self.setBrush(self.color)  # Update display color
-
-    # Updates the list of accessible (non-barrier) neighbors. Checks up, down, left, and right.
-    def update_neighbors(self, grid):
-        self.neighbors = []
-        
-        # Check DOWN (row + 1) if it's within bounds and not a barrier
-        if self.row < self.total_rows - 1 and grid[self.row + 1][self.col].type in self.traversable:
-            self.neighbors.append(grid[self.row + 1][self.col])
-        
-        # Check UP (row - 1) if it's within bounds and not a barrier
-        if self.row > 0 and grid[self.row - 1][self.col].type in self.traversable:
-            self.neighbors.append(grid[self.row - 1][self.col])
-        
-        # Check RIGHT (col + 1) if it's within bounds and not a barrier
-        if self.col < self.total_cols - 1 and grid[self.row][self.col + 1].type in self.traversable:
-            self.neighbors.append(grid[self.row][self.col + 1])
-        
-        # Check LEFT (col - 1) if it's within bounds and not a barrier
-        if self.col > 0 and grid[self.row][self.col - 1].type in self.traversable:
-            self.neighbors.append(grid[self.row][self.col - 1])
-
 
     def updateColor(self):
+        parent = self.parent
+        selected_color = parent.selected_color
         currType = self.type  # Store current type
-        
+
         # Ensure start node is unique; do not allow multiple starts
-        if self.parent.start and self.parent.selected_color == self.parent.color_map['start']:
+        if parent.start and selected_color == parent.color_map['start']:
             return  # Ignore click if a start node is already set
-        
+
         # If the clicked node is the current start, remove it
         elif currType == 'start':
-            self.parent.start = None
-        
+            parent.start = None
+
         # If the clicked node is a goal, remove it from the goal list
         elif currType == 'goal':
             try:
-                self.parent.goals.remove(self)
-            except:
+                parent.goals.remove(self)
+            except ValueError:
                 pass
-        
+
         # Assign new node type based on the selected color
-        if self.parent.selected_name:
-            self.streetName = self.parent.selected_name
-        if self.parent.selected_cost:
-            self.cost = float(self.parent.selected_cost)
-        if self.parent.selected_color == self.parent.color_map['start']:
-            self.parent.start = self  # Set new start node
-            self.currColor = self.parent.selected_color
-            self.type = 'start'
-            self.color = self.currColor
-        
-        elif self.parent.selected_color == self.parent.color_map['goal']:
-            self.parent.goals.append(self)  # Add to goal list
-            self.currColor = self.parent.selected_color
-            self.type = 'goal'
-            self.color = self.currColor
-        
-        elif self.parent.selected_color == self.parent.color_map['barrier']:
-            self.currColor = self.parent.selected_color
-            self.type = 'barrier'  # Mark as an obstacle
-            self.color = self.currColor
-        
-        elif self.parent.selected_color == self.parent.color_map['reset3']:
-            self.currColor = self.parent.selected_color
-            self.type = 'reset3'  # Mark as empty
-            self.color = self.currColor
-
-        elif self.parent.selected_color == self.parent.color_map['reset2']:
-            self.currColor = self.parent.selected_color
-            self.type = 'reset2'  # Mark as empty
-            self.color = self.currColor
-        
-        elif self.parent.selected_color == self.parent.color_map['reset']:
-            self.currColor = self.parent.selected_color
-            self.type = 'reset'  # Mark as empty
-            self.color = self.currColor
-        
-        elif self.parent.selected_color == self.parent.color_map['path_point']:
-            self.currColor = self.parent.selected_color
-            self.type = 'path_point'  # Mark as path_point
-            self.color = self.currColor
-
-        elif self.parent.selected_color == self.parent.color_map['closed']:
-            self.currColor = self.parent.selected_color
-            self.type = 'closed'  # Mark as closed
-            self.color = self.currColor
-        
+        new_type = next((cell_type for cell_type in PAINTABLE_TYPES if selected_color == parent.color_map[cell_type]), currType)
+        if new_type == 'start':
+            parent.start = self  # Set new start node
+        elif new_type == 'goal':
+            parent.goals.append(self)  # Add to goal list
+        street_name = parent.selected_name or self.streetName
+        cost = float(parent.selected_cost) if parent.selected_cost else self.cost
+
         # Apply the selected color to the node
-        self.setBrush(self.parent.selected_color)
+        self.setBrush(selected_color)
+
+        # Patch the routing grid so only this cell's adjacency is recomputed
+        parent.routing_grid.set_cell(self.row, self.col, new_type, cost, street_name)
+
+
+class Node(GridCell, QGraphicsRectItem):
+    __slots__ = ("parent", "row", "col", "index")
+
+    def __init__(self, row, col, width, parent):
+        super().__init__(col * width, row * width, width, width)  # Square grid cell at its position
+
+        # Grid position and parent reference
+        self.parent = parent  # Reference to the main application
+        self.row = row  # Row index
+        self.col = col  # Column index
+        self.index = row * parent.routing_grid.cols + col  # Index into the routing grid's layers
+
+        # Allow selection for user interaction
+        self.setAcceptHoverEvents(True)  # Enable hover events
+        self.setAcceptedMouseButtons(Qt.LeftButton)  # Accept left clicks
+        self.setFlag(QGraphicsRectItem.ItemIsSelectable, True)
+
+    # The color shown is the brush's; brushes are shared between cells of the same color
+    @property
+    def color(self):
+        return self.brush().color()
+
+    @color.setter
+    def color(self, color):
+        self.setBrush(color)
+
+    # Takes a color, or a brush from shared_brush
+    def setBrush(self, color):
+        super().setBrush(color if isinstance(color, QBrush) else shared_brush(color))
 
     # Start panning with right mouse button
     def mousePressEvent(self, event: QMouseEvent):
@@ -176,4 +166,3 @@ class Node(QGraphicsRectItem):
     def hoverLeaveEvent(self, event):
         self.parent.clear_info_panel()
         super().hoverLeaveEvent(event)
-
@@ -0,0 +1,159 @@
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PyQt5.QtCore import Qt, QRectF, QLineF
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+import math
+import numpy as np
+from gridNode import GridCell
+from routingGrid import CELL_TYPES
+
+# Cell outlines are only drawn once a cell is at least this many screen pixels wide
+OUTLINE_MIN_PIXELS = 6
+
+
+# Lightweight stand-in for a Node in raster mode. Created on demand; type, cost and street
+# live in the routing grid and the color lives in the raster image.
+class RasterCell(GridCell):
+    __slots__ = ("raster", "parent", "row", "col", "index")
+
+    def __init__(self, raster, row, col):
+        self.raster = raster
+        self.parent = raster.parent
+        self.row = row
+        self.col = col
+        self.index = row * raster.cols + col
+
+    def __eq__(self, other):
+        return isinstance(other, RasterCell) and self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
+    @property
+    def color(self):
+        return QColor.fromRgb(int(self.raster.pixels.flat[self.index]))
+
+    @color.setter
+    def color(self, color):
+        self.setBrush(color)
+
+    def setBrush(self, color):
+        self.raster.set_pixel(self.row, self.col, color)
+
+
+class RasterRow:
+    def __init__(self, raster, row):
+        self.raster = raster
+        self.row = row
+
+    def __getitem__(self, col):
+        return RasterCell(self.raster, self.row, col)
+
+    def __len__(self):
+        return self.raster.cols
+
+    def __iter__(self):
+        return (RasterCell(self.raster, self.row, col) for col in range(self.raster.cols))
+
+
+# Whole grid drawn as one QImage with a pixel per cell, scaled up to CELL_SIZE when painted.
+# Indexing (grid[row][col]) and iteration yield RasterCells so it can stand in for the Node grid.
+class RasterGrid(QGraphicsItem):
+    def __init__(self, parent, rows, cols, cell_size):
+        super().__init__()
+        self.parent = parent
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.palette = np.array([parent.color_map[cell_type].rgb() for cell_type in CELL_TYPES], dtype=np.uint32)
+        self.pixels = np.zeros((rows, cols), dtype=np.uint32)
+        self.image = QImage(self.pixels.data, cols, rows, cols * 4, QImage.Format_RGB32)
+        self.hover_cell = None
+        self.drag_cell = None
+
+        self.setAcceptHoverEvents(True)
+        self.setAcceptedMouseButtons(Qt.LeftButton)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)  # Needed for exposedRect
+
+    def __getitem__(self, row):
+        return RasterRow(self, row)
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        return (RasterRow(self, row) for row in range(self.rows))
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.cols * self.cell_size, self.rows * self.cell_size)
+
+    # Repaints every cell from its type
+    def show_types(self, types):
+        self.pixels[:] = self.palette[types].reshape(self.rows, self.cols)
+        self.update()
+
+    def show_cells(self, cells, color):
+        self.pixels.reshape(-1)[cells] = QColor(color).rgb()
+        self.update()
+
+    def set_pixel(self, row, col, color):
+        self.pixels[row, col] = QColor(color).rgb()
+        self.update(QRectF(col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size))
+
+    def cell_at(self, pos):
+        row = math.floor(pos.y() / self.cell_size)
+        col = math.floor(pos.x() / self.cell_size)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return RasterCell(self, row, col)
+        return None
+
+    # Draws only the exposed part of the image, plus cell outlines when zoomed in far enough
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        left = int(exposed.left() // self.cell_size)
+        top = int(exposed.top() // self.cell_size)
+        right = min(self.cols, int(math.ceil(exposed.right() / self.cell_size)))
+        bottom = min(self.rows, int(math.ceil(exposed.bottom() / self.cell_size)))
+        source = QRectF(left, top, right - left, bottom - top)
+        target = QRectF(left * self.cell_size, top * self.cell_size, source.width() * self.cell_size, source.height() * self.cell_size)
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        painter.drawImage(target, self.image, source)
+
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if scale * self.cell_size >= OUTLINE_MIN_PIXELS:
+            painter.setPen(QPen(Qt.black, 0))
+            lines = [QLineF(target.left(), y * self.cell_size, target.right(), y * self.cell_size) for y in range(top, bottom + 1)]
+            lines += [QLineF(x * self.cell_size, target.top(), x * self.cell_size, target.bottom()) for x in range(left, right + 1)]
+            painter.drawLines(lines)
+
+    def hoverMoveEvent(self, event):
+        cell = self.cell_at(event.pos())
+        if cell is not None and cell != self.hover_cell:
+            self.hover_cell = cell
+            self.parent.update_info_panel(cell)
+
+    def hoverLeaveEvent(self, event):
+        self.hover_cell = None
+        self.parent.clear_info_panel()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.parent.isLeftClicking = True
+            self.drag_cell = self.cell_at(event.pos())
+            if self.drag_cell is not None:
+                self.drag_cell.updateColor()
+
+    # Paints each cell the cursor passes over once while the left button is held
+    def mouseMoveEvent(self, event):
+        if self.parent.isLeftClicking:
+            cell = self.cell_at(event.pos())
+            if cell is not None and cell != self.drag_cell:
+                self.drag_cell = cell
+                cell.updateColor()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.parent.isLeftClicking = False
+            self.drag_cell = None
@@ -0,0 +1,286 @@
+import heapq
+import threading
+from itertools import chain
+import numpy as np
+from routingGrid import TRAVERSABLE, SearchCancelled
+
+# Side length, in cells, of the square clusters the abstract graph is built over
+CLUSTER_SIZE = 32
+
+
+# Precomputed part of the abstract graph for one cluster. Its nodes are the traversable cells
+# on its border with a traversable neighbor in another cluster. Edges go to every other node of
+# the cluster, costing the shortest path that stays inside it, and across the border in one step.
+# Every path between clusters crosses a border at such a pair of cells, so the abstract graph
+# keeps the exact path cost.
+class Cluster:
+    def __init__(self, nodes, edges):
+        self.nodes = nodes  # Set of cell indices
+        self.edges = edges  # Cell index -> list of (cell index, cost)
+
+
+# Cluster graphs for one grid, kept current by an edit listener. Edited clusters are marked
+# dirty with the grid version of the edit and rebuilt by the next query, which may run on a
+# snapshot of the grid (see PathWorker); they stay dirty until a snapshot that includes the edit.
+class Hierarchy:
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid  # The grid receiving edits, for its version
+        self.cluster_size = cluster_size
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.cluster_cols = -(-grid.cols // cluster_size)
+        self.clusters = [None] * (-(-grid.rows // cluster_size) * self.cluster_cols)
+        self.dirty = {}  # Cluster id -> grid version of its latest edit
+        self.dirty_lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        grid.edit_listeners.append(self.invalidate)
+
+    def cluster_of(self, index):
+        row, col = divmod(int(index), self.cols)
+        return (row // self.cluster_size) * self.cluster_cols + col // self.cluster_size
+
+    # (first row, end row, first col, end col) of a cluster
+    def bounds(self, cluster):
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        row = cluster_row * self.cluster_size
+        col = cluster_col * self.cluster_size
+        return row, min(row + self.cluster_size, self.rows), col, min(col + self.cluster_size, self.cols)
+
+    def cells(self, cluster):
+        row_start, row_end, col_start, col_end = self.bounds(cluster)
+        return (np.arange(row_start, row_end)[:, None] * self.cols + np.arange(col_start, col_end)[None, :]).ravel()
+
+    # Edit listener. An edit can change which border cells of the neighboring clusters are nodes,
+    # so those are marked too.
+    def invalidate(self, index):
+        version = self.grid.version
+        with self.dirty_lock:
+            if index is None:
+                for cluster in range(len(self.clusters)):
+                    self.dirty[cluster] = version
+                return
+            rows, cols = np.divmod(self.grid.neighborhood(np.atleast_1d(index)), self.cols)
+            for cluster in np.unique(rows // self.cluster_size * self.cluster_cols + cols // self.cluster_size).tolist():
+                self.dirty[cluster] = version
+
+    # Rebuilds unbuilt and edited clusters from grid, the grid itself or a snapshot of it
+    def refresh(self, grid):
+        with self.build_lock:
+            with self.dirty_lock:
+                stale = [cluster for cluster, built in enumerate(self.clusters) if built is None or cluster in self.dirty]
+            if not stale:
+                return
+            walkable = TRAVERSABLE[grid.types].tolist()
+            for cluster in stale:
+                self.clusters[cluster] = self.build_cluster(grid, walkable, cluster)
+            with self.dirty_lock:
+                self.dirty = {cluster: version for cluster, version in self.dirty.items() if version > grid.version}
+
+    def build_cluster(self, grid, walkable, cluster):
+        bounds = self.bounds(cluster)
+        row_start, row_end, col_start, col_end = bounds
+        cols = self.cols
+        border = {}  # Node -> its traversable neighbors in other clusters
+        for row in range(row_start, row_end):
+            for col in range(col_start, col_end):
+                index = row * cols + col
+                if not walkable[index]:
+                    continue
+                across = []
+                if row == row_start and row > 0:
+                    across.append(index - cols)
+                if row == row_end - 1 and row < self.rows - 1:
+                    across.append(index + cols)
+                if col == col_start and col > 0:
+                    across.append(index - 1)
+                if col == col_end - 1 and col < self.cols - 1:
+                    across.append(index + 1)
+                across = [neighbor for neighbor in across if walkable[neighbor]]
+                if across:
+                    border[index] = across
+
+        move_costs = grid.move_costs()
+        edges = {}
+        for node, across in border.items():
+            distances, _ = cluster_dijkstra(grid, bounds, node, border)
+            node_edges = [(other, distance) for other, distance in distances.items() if other != node and other in border]
+            node_edges.extend((neighbor, move_costs[neighbor]) for neighbor in across)
+            edges[node] = node_edges
+        return Cluster(set(border), edges)
+
+
+def hierarchy_for(grid):
+    if grid.hierarchy is None:
+        grid.hierarchy = Hierarchy(grid)
+    return grid.hierarchy
+
+
+# Dijkstra from source restricted to the cells inside bounds, stopping once every cell in targets
+# is settled. With reverse, distances are to source rather than from it. With a single target,
+# guide=True orders the search by the same heuristic as A* so it heads straight for it.
+# Returns (distances, came_from) dicts over the settled cells.
+def cluster_dijkstra(grid, bounds, source, targets=None, reverse=False, guide=False):
+    row_start, row_end, col_start, col_end = bounds
+    cols = grid.cols
+    neighbor_lists = grid.neighbor_lists()
+    move_costs = grid.move_costs()
+    walkable = TRAVERSABLE[grid.types] if reverse else None
+    remaining = set(targets) if targets is not None else None
+    if guide:
+        (target,) = targets
+        target_row, target_col = divmod(target, cols)
+        step_cost = grid.min_step_cost()
+    distances = {}
+    came_from = {source: None}
+    best = {source: 0.0}
+    open_set = [(0.0, 0.0, source)]
+    while open_set:
+        _, distance, current = heapq.heappop(open_set)
+        if current in distances:
+            continue
+        distances[current] = distance
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+
+        if reverse:
+            # Cells that can step into current; only traversable cells are passed through
+            neighbors = [neighbor for neighbor in grid.adjacent_cells(current) if walkable[neighbor]]
+        else:
+            neighbors = neighbor_lists[current]
+        for neighbor in neighbors:
+            row, col = divmod(neighbor, cols)
+            if not (row_start <= row < row_end and col_start <= col < col_end) or neighbor in distances:
+                continue
+            temp = distance + (move_costs[current] if reverse else move_costs[neighbor])
+            if temp < best.get(neighbor, float('inf')):
+                best[neighbor] = temp
+                came_from[neighbor] = current
+                priority = temp + (abs(target_row - row) + abs(target_col - col)) * step_cost if guide else temp
+                heapq.heappush(open_set, (priority, temp, neighbor))
+    return distances, came_from
+
+
+# HPA* over the cluster graph: start and goal are linked to the nodes of their clusters, the
+# abstract graph is searched with A*, and each abstract edge is refined into cells. The path
+# costs the same as astar's. on_push and on_close are called with abstract nodes as they are
+# queued and expanded, and on_read once with the cells of every cluster the result depends on.
+# Clusters edited since the last refresh are rebuilt first; searchEngines.refresh_engine does
+# that ahead of the search.
+def hpa(grid, start, goal, on_push=None, on_close=None, should_stop=None, on_read=None):
+    if start == goal:
+        return np.array([start], dtype=np.int64)
+    if not TRAVERSABLE[grid.types[goal]]:
+        return None
+
+    hierarchy = hierarchy_for(grid)
+    hierarchy.refresh(grid)
+    clusters = hierarchy.clusters
+    cluster_of = hierarchy.cluster_of
+    move_costs = grid.move_costs()
+    goal_cluster = cluster_of(goal)
+    extra = {}  # Edges added for this query: cell -> list of (cell, cost)
+    touched = set()  # Clusters whose cells the result depends on
+
+    # Edges from a cell to the nodes of its cluster, and to the goal when it is in the same one
+    def link(cell):
+        cluster = cluster_of(cell)
+        touched.add(cluster)
+        targets = set(clusters[cluster].nodes)
+        if cluster == goal_cluster:
+            targets.add(goal)
+        distances, _ = cluster_dijkstra(grid, hierarchy.bounds(cluster), cell, targets)
+        return [(other, distance) for other, distance in distances.items() if other != cell and other in targets]
+
+    # The start may not be traversable, so its neighbors across a border may not be nodes yet
+    start_edges = link(start)
+    for neighbor in grid.neighbor_lists()[start]:
+        neighbor_cluster = cluster_of(neighbor)
+        if neighbor_cluster != cluster_of(start):
+            if neighbor not in clusters[neighbor_cluster].nodes and neighbor not in extra:
+                extra[neighbor] = link(neighbor)
+            start_edges.append((neighbor, move_costs[neighbor]))
+    extra.setdefault(start, []).extend(start_edges)
+
+    touched.add(goal_cluster)
+    goal_nodes = clusters[goal_cluster].nodes
+    distances, _ = cluster_dijkstra(grid, hierarchy.bounds(goal_cluster), goal, goal_nodes, reverse=True)
+    for node, distance in distances.items():
+        if node in goal_nodes and node != goal:
+            extra.setdefault(node, []).append((goal, distance))
+
+    cols = grid.cols
+    goal_row, goal_col = divmod(goal, cols)
+    step_cost = grid.min_step_cost()
+
+    def heuristic(index):
+        row, col = divmod(index, cols)
+        return (abs(goal_col - col) + abs(goal_row - row)) * step_cost
+
+    g_score = {start: 0.0}
+    came_from = {start: None}
+    closed = set()
+    counter = 0
+    h = heuristic(start)
+    open_set = [(h, h, counter, start)]
+    found = False
+    while open_set:
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+
+        _, _, _, current = heapq.heappop(open_set)
+        if current in closed:
+            continue
+        if current == goal:
+            found = True
+            break
+        closed.add(current)
+        if on_close is not None:
+            on_close(current)
+
+        cluster = clusters[cluster_of(current)]
+        for neighbor, cost in chain(cluster.edges.get(current, ()), extra.get(current, ())):
+            if neighbor in closed:
+                continue
+            temp_g_score = g_score[current] + cost
+            if temp_g_score < g_score.get(neighbor, float('inf')):
+                g_score[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                touched.add(cluster_of(neighbor))
+                h = heuristic(neighbor)
+                counter += 1
+                heapq.heappush(open_set, (temp_g_score + h, h, counter, neighbor))
+                if on_push is not None:
+                    on_push(neighbor)
+
+    if on_read is not None:
+        on_read(np.concatenate([hierarchy.cells(cluster) for cluster in sorted(touched)]))
+    if not found:
+        return None
+
+    nodes = []
+    node = goal
+    while node is not None:
+        nodes.append(node)
+        node = came_from[node]
+    nodes.reverse()
+    return _refine(grid, hierarchy, nodes)
+
+
+# Expands abstract edges into cells: a step across a border, or the shortest path inside a cluster
+def _refine(grid, hierarchy, nodes):
+    path = [nodes[0]]
+    for previous, current in zip(nodes, nodes[1:]):
+        cluster = hierarchy.cluster_of(current)
+        if hierarchy.cluster_of(previous) != cluster:
+            path.append(current)
+            continue
+        _, came_from = cluster_dijkstra(grid, hierarchy.bounds(cluster), previous, [current], guide=True)
+        leg = []
+        cell = current
+        while cell != previous:
+            leg.append(cell)
+            cell = came_from[cell]
+        path.extend(reversed(leg))
+    return np.array(path, dtype=np.int64)
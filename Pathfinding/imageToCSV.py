@@ -1,14 +1,16 @@
 import os
 import csv
+import argparse
+import numpy as np
 from PIL import Image
-import math
-import tkinter as tk
-from tkinter import filedialog
+from routingGrid import RoutingGrid, TYPE_CODES
+from gridBinary import BINARY_EXTENSION, write_grid
 
 # Constants
 PIXEL_PER_WIDTH = 6  # Width of each grid cell
 PIXEL_PER_HEIGHT = 6  # Height of each grid cell
 OUTPUT_DIR = "Pathfinding/Grids/"
+CHUNK_ROWS = 256  # Grid rows averaged at a time
 
 # Hardcoded color palette
 color_map = {
@@ -20,48 +22,103 @@ color_map = {
     "WHITE": (255, 255, 255)
 }
 
-def euclidean_distance(c1, c2):
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1, c2)))
+# Cell type for each palette color, matching the application's color_map
+palette_types = {
+    "BLUE": "closed",
+    "RED": "reset2",
+    "YELLOW": "reset3",
+    "GREY": "path_point",
+    "ORANGE": "reset",
+    "WHITE": "reset1"
+}
+
+# colors: legacy "(r, g, b)" CSV read by GridFileManager.import_color
+# grid: CSV in the GridFileManager export format
+# navgrid: binary grid format from gridBinary
+OUTPUT_FORMATS = ["colors", "grid", "navgrid"]
+
+
+# Averages each PIXEL_PER_WIDTH x PIXEL_PER_HEIGHT block and picks the nearest palette color.
+# Returns a (grid_height, grid_width) array of indices into color_map. The image is averaged
+# CHUNK_ROWS grid rows at a time and compared with one palette color at a time, so memory stays
+# within a small multiple of the image's own size.
+def palette_indices(image):
+    pixels = np.asarray(image.convert("RGB"))  # uint8
+    grid_height = pixels.shape[0] // PIXEL_PER_HEIGHT
+    grid_width = pixels.shape[1] // PIXEL_PER_WIDTH
+    palette = np.array(list(color_map.values()), dtype=np.int32)
 
-def closest_palette_color(rgb):
-    return min(color_map.values(), key=lambda color: euclidean_distance(rgb, color))
+    indices = np.zeros((grid_height, grid_width), dtype=np.int64)
+    for first_row in range(0, grid_height, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, grid_height - first_row)
+        chunk = pixels[first_row * PIXEL_PER_HEIGHT:(first_row + rows) * PIXEL_PER_HEIGHT, :grid_width * PIXEL_PER_WIDTH]
+        blocks = chunk.reshape(rows, PIXEL_PER_HEIGHT, grid_width, PIXEL_PER_WIDTH, 3)
+        avg_colors = blocks.sum(axis=(1, 3), dtype=np.int32) // (PIXEL_PER_WIDTH * PIXEL_PER_HEIGHT)
 
-def process_image(image_path):
-    image = Image.open(image_path).convert("RGB")
+        # Running nearest color; ties keep the earlier palette entry, as argmin would
+        best = np.full((rows, grid_width), np.iinfo(np.int32).max, dtype=np.int32)
+        nearest = indices[first_row:first_row + rows]
+        for palette_index, color in enumerate(palette):
+            distance = np.sum((avg_colors - color) ** 2, axis=-1, dtype=np.int32)
+            closer = distance < best
+            best[closer] = distance[closer]
+            nearest[closer] = palette_index
+    return indices
+
+
+def process_image(image_path, output_format="colors", output_dir=OUTPUT_DIR):
+    image = Image.open(image_path)
     width, height = image.size
     print(f'Image Width: {width}')
     print(f'Image Height: {height}')
-    grid_width = width // PIXEL_PER_WIDTH
-    grid_height = height // PIXEL_PER_HEIGHT
-
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    output_csv = os.path.join(OUTPUT_DIR, os.path.basename(image_path).rsplit(".", 1)[0] + ".csv")
+    indices = palette_indices(image)
+    grid_height, grid_width = indices.shape
     print(f'Grid Cols or Width: {grid_width}')
     print(f'Grid Rows or Height: {grid_height}')
-    
-    with open(output_csv, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        
-        for y in range(grid_height):
-            row_colors = []
-            for x in range(grid_width):
-                region = image.crop((
-                    x * PIXEL_PER_WIDTH, y * PIXEL_PER_HEIGHT,
-                    (x + 1) * PIXEL_PER_WIDTH, (y + 1) * PIXEL_PER_HEIGHT
-                ))
-                avg_color = tuple(sum(channel) // (PIXEL_PER_WIDTH * PIXEL_PER_HEIGHT) for channel in zip(*region.getdata()))
-                mapped_color = closest_palette_color(avg_color)
-                row_colors.append(f"{mapped_color}")
-            writer.writerow(row_colors)
-    
-    print(f"Grid saved to {output_csv}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.basename(image_path).rsplit(".", 1)[0]
+    palette_names = list(color_map)
+
+    if output_format == "navgrid":
+        output_path = os.path.join(output_dir, base_name + BINARY_EXTENSION)
+        type_codes = np.array([TYPE_CODES[palette_types[name]] for name in palette_names], dtype=np.uint8)
+        grid = RoutingGrid(grid_height, grid_width, types=type_codes[indices].ravel())
+        write_grid(output_path, grid, [])
+    else:
+        output_path = os.path.join(output_dir, base_name + ".csv")
+        if output_format == "grid":
+            cell_text = [f"{palette_types[name]}:{r},{g},{b}:1:" for name, (r, g, b) in color_map.items()]
+        else:
+            cell_text = [f"{color}" for color in color_map.values()]
+
+        with open(output_path, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            if output_format == "grid":
+                writer.writerow([])  # Empty business header row
+            for row in indices.tolist():
+                writer.writerow([cell_text[index] for index in row])
+
+    print(f"Grid saved to {output_path}")
+    return output_path
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    root.withdraw()  # Hide the main Tkinter window
-    file_path = filedialog.askopenfilename(title="Select an Image", filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif")])
-    
+    parser = argparse.ArgumentParser(description="Convert a map image into a grid file")
+    parser.add_argument("image", nargs="?", help="Image to convert. Opens a file dialog if omitted.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="colors")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    file_path = args.image
+    if not file_path:
+        import tkinter as tk
+        from tkinter import filedialog
+        root = tk.Tk()
+        root.withdraw()  # Hide the main Tkinter window
+        file_path = filedialog.askopenfilename(title="Select an Image", filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif")])
+
     if file_path:
-        process_image(file_path)
+        process_image(file_path, args.format, args.output_dir)
     else:
         print("No file selected.")
@@ -0,0 +1,229 @@
+import heapq
+import threading
+from collections import OrderedDict
+import numpy as np
+from routingGrid import TRAVERSABLE, SearchCancelled
+
+# Planners kept for the most recently searched (start, goal) pairs
+MAX_PLANNERS = 16
+# Past this fraction of changed cells a fresh search is cheaper than repairing the old one
+REPLAN_LIMIT = 0.05
+# Relative tolerance for comparing costs summed in different orders
+COST_TOLERANCE = 1e-9
+
+_planners = OrderedDict()
+_planners_lock = threading.Lock()
+
+
+# Raised by IncrementalPlanner.path when the planner's costs don't lead back to the start
+class PlannerInconsistent(Exception):
+    pass
+
+
+def _close(a, b):
+    return a == b or abs(a - b) <= COST_TOLERANCE * max(1.0, min(abs(a), abs(b)))
+
+
+# Whether key a orders strictly before key b, ignoring differences within COST_TOLERANCE
+def _key_before(a, b):
+    if not _close(a[0], b[0]):
+        return a[0] < b[0]
+    return not _close(a[1], b[1]) and a[1] < b[1]
+
+
+# Lifelong Planning A* (LPA*) for one start and goal. g holds each cell's cost from the start as
+# of the last search and rhs the cost its predecessors currently offer; a cell is inconsistent
+# when they differ and only those are queued. After an edit only the edited cells and their
+# neighbors are re-evaluated, and the search repairs the part of the tree they affect.
+# Same cost model as astar, with the scaled Manhattan heuristic.
+class IncrementalPlanner:
+    def __init__(self, grid, start, goal):
+        self.start = start
+        self.goal = goal
+        self.cols = grid.cols
+        self.step_cost = grid.min_step_cost()
+        self.goal_row, self.goal_col = divmod(goal, grid.cols)
+        self.start_neighbors = set(grid.adjacent_cells(start))
+        self.types = grid.types.copy()  # Layers as of the last search, to find what was edited since
+        self.costs = grid.costs.copy()
+        self.g = {}
+        self.rhs = {start: 0.0}
+        self.queue = []
+        self.queued = {}  # Cell -> key of its live queue entry
+        self.counter = 0
+        self.on_push = None
+        self.bind(grid)
+        self.push(start)
+
+    def bind(self, grid):
+        self.grid = grid
+        self.walkable = TRAVERSABLE[grid.types].tolist()
+        self.move_costs = grid.move_costs()
+        self.neighbor_lists = grid.neighbor_lists()
+
+    def key(self, cell):
+        best = min(self.g.get(cell, float('inf')), self.rhs.get(cell, float('inf')))
+        row, col = divmod(cell, self.cols)
+        return (best + (abs(self.goal_col - col) + abs(self.goal_row - row)) * self.step_cost, best)
+
+    def push(self, cell):
+        key = self.key(cell)
+        self.queued[cell] = key
+        self.counter += 1
+        heapq.heappush(self.queue, (key[0], key[1], self.counter, cell))
+        if self.on_push is not None:
+            self.on_push(cell)
+
+    # Cells that can step onto cell: traversable neighbors, or the start itself
+    def predecessors(self, cell):
+        if not self.walkable[cell]:
+            return []
+        if cell in self.start_neighbors and not self.walkable[self.start]:
+            return self.neighbor_lists[cell] + [self.start]
+        return self.neighbor_lists[cell]
+
+    def successors(self, cell):
+        if cell == self.start or self.walkable[cell]:
+            return self.neighbor_lists[cell]
+        return []
+
+    # Queues cell if g and rhs differ, dropping its previous entry either way
+    def requeue(self, cell):
+        self.queued.pop(cell, None)
+        if self.g.get(cell, float('inf')) != self.rhs.get(cell, float('inf')):
+            self.push(cell)
+
+    # Recomputes rhs from the predecessors and queues the cell if it became inconsistent
+    def update_cell(self, cell):
+        if cell != self.start:
+            g = self.g
+            best = min((g.get(neighbor, float('inf')) for neighbor in self.predecessors(cell)), default=float('inf'))
+            if best == float('inf'):
+                self.rhs.pop(cell, None)
+            else:
+                self.rhs[cell] = best + self.move_costs[cell]
+        self.requeue(cell)
+
+    # Cells whose type or cost differ in grid from the last search
+    def changed_cells(self, grid):
+        return np.flatnonzero((self.types != grid.types) | (self.costs != grid.costs))
+
+    def apply_changes(self, grid, changed):
+        self.types = grid.types.copy()
+        self.costs = grid.costs.copy()
+        self.bind(grid)
+        affected = set()
+        for cell in changed.tolist():
+            affected.add(cell)
+            affected.update(grid.adjacent_cells(cell))
+        for cell in affected:
+            self.update_cell(cell)
+
+    def compute(self, on_push=None, on_close=None, should_stop=None):
+        if len(self.queue) > 2 * len(self.queued):
+            # Mostly superseded entries left over from earlier searches
+            self.queue = [(key[0], key[1], order, cell) for order, (cell, key) in enumerate(self.queued.items())]
+            heapq.heapify(self.queue)
+            self.counter = len(self.queue)
+        self.on_push = on_push
+        g = self.g
+        rhs = self.rhs
+        queue = self.queue
+        queued = self.queued
+        goal = self.goal
+        start = self.start
+        move_costs = self.move_costs
+        try:
+            while queue:
+                k1, k2, _, cell = queue[0]
+                if queued.get(cell) != (k1, k2):
+                    heapq.heappop(queue)  # Superseded entry
+                    continue
+                if not _key_before((k1, k2), self.key(goal)) and rhs.get(goal, float('inf')) == g.get(goal, float('inf')):
+                    break
+                if should_stop is not None and should_stop():
+                    raise SearchCancelled()
+
+                heapq.heappop(queue)
+                del queued[cell]
+                cell_g = g.get(cell, float('inf'))
+                cell_rhs = rhs.get(cell, float('inf'))
+                if cell_g > cell_rhs:
+                    # Settled at a lower cost: successors can only get cheaper through it
+                    g[cell] = cell_rhs
+                    for successor in self.successors(cell):
+                        through = cell_rhs + move_costs[successor]
+                        if successor != start and through < rhs.get(successor, float('inf')):
+                            rhs[successor] = through
+                            self.requeue(successor)
+                else:
+                    # Got more expensive: successors whose rhs came through it are re-evaluated
+                    del g[cell]
+                    self.update_cell(cell)
+                    for successor in self.successors(cell):
+                        if rhs.get(successor) == cell_g + move_costs[successor]:
+                            self.update_cell(successor)
+                if on_close is not None:
+                    on_close(cell)
+        finally:
+            self.on_push = None
+
+    # Follows the cheapest predecessors back from the goal, or None if it is unreachable. Raises
+    # PlannerInconsistent if a step doesn't account for its cell's cost or the walk revisits a cell.
+    def path(self, should_stop=None):
+        g = self.g
+        if g.get(self.goal, float('inf')) == float('inf'):
+            return None
+        cell = self.goal
+        path = [cell]
+        seen = {cell}
+        while cell != self.start:
+            if should_stop is not None and should_stop():
+                raise SearchCancelled()
+            previous = min(self.predecessors(cell), key=lambda neighbor: g.get(neighbor, float('inf')), default=None)
+            if previous is None or previous in seen or not _close(g.get(previous, float('inf')) + self.move_costs[cell], g[cell]):
+                raise PlannerInconsistent()
+            cell = previous
+            seen.add(cell)
+            path.append(cell)
+        path.reverse()
+        return np.array(path, dtype=np.int64)
+
+
+# Search engine that keeps an LPA* planner per (start, goal) between queries and repairs it
+# after edits instead of searching from scratch. on_close is called with the cells expanded by
+# this query, and on_read with every cell the result depends on (for the route cache). A repaired
+# planner that doesn't lead back to the start is replaced by a fresh search.
+def incremental_astar(grid, start, goal, on_push=None, on_close=None, should_stop=None, on_read=None):
+    if start == goal:
+        return np.array([start], dtype=np.int64)
+
+    with _planners_lock:
+        key = (start, goal, grid.rows, grid.cols)
+        planner = _planners.pop(key, None)
+        if planner is not None and grid.min_step_cost() < planner.step_cost:
+            planner = None  # The heuristic would no longer be admissible
+        if planner is not None:
+            changed = planner.changed_cells(grid)
+            if changed.size > REPLAN_LIMIT * grid.size:
+                planner = None
+            else:
+                planner.apply_changes(grid, changed)
+        if planner is None:
+            planner = IncrementalPlanner(grid, start, goal)
+        _planners[key] = planner
+        while len(_planners) > MAX_PLANNERS:
+            _planners.popitem(last=False)
+
+        # A cancelled compute raises before the path is read, leaving the planner to resume later
+        planner.compute(on_push, on_close, should_stop)
+        try:
+            path = planner.path(should_stop)
+        except PlannerInconsistent:
+            print(f"Incremental search for {start} -> {goal} went inconsistent, searching again from scratch")
+            planner = _planners[key] = IncrementalPlanner(grid, start, goal)
+            planner.compute(on_push, on_close, should_stop)
+            path = planner.path(should_stop)
+        if on_read is not None:
+            on_read(np.fromiter(planner.g, dtype=np.int64, count=len(planner.g)))
+        return path
@@ -0,0 +1,127 @@
+import heapq
+import numpy as np
+from routingGrid import TRAVERSABLE, SearchCancelled, astar
+
+
+# Jump point search for 4-connected grids where every traversable cell costs the same. Only
+# "horizontal first" paths are searched: moving horizontally, both vertical directions are
+# scanned from every cell; moving vertically, the search only turns where an obstacle behind
+# forces it to. Straight runs between jump points are skipped instead of queued cell by cell.
+# Weighted maps have no such symmetry to prune, so they fall back to plain A*.
+# on_close is called with every cell scanned, on_push with every jump point queued.
+def jps(grid, start, goal, on_push=None, on_close=None, should_stop=None):
+    step_cost = grid.uniform_step_cost()
+    if step_cost is None:
+        return astar(grid, start, goal, on_push, on_close, should_stop)
+    if start == goal:
+        return np.array([start], dtype=np.int64)
+
+    rows = grid.rows
+    cols = grid.cols
+    walkable = TRAVERSABLE[grid.types].tolist()
+    goal_row, goal_col = divmod(goal, cols)
+
+    def free(row, col):
+        return 0 <= row < rows and 0 <= col < cols and walkable[row * cols + col]
+
+    def scanned(index):
+        if on_close is not None:
+            on_close(index)
+
+    # Steps along a column until the goal, a forced turn, or a wall
+    def jump_vertical(row, col, drow):
+        while True:
+            row += drow
+            if not free(row, col):
+                return None
+            index = row * cols + col
+            scanned(index)
+            if index == goal:
+                return index
+            for side in (-1, 1):
+                if free(row, col + side) and not free(row - drow, col + side):
+                    return index
+
+    # Steps along a row until the goal, a wall, or a cell whose vertical scans find something
+    def jump_horizontal(row, col, dcol):
+        while True:
+            col += dcol
+            if not free(row, col):
+                return None
+            index = row * cols + col
+            scanned(index)
+            if index == goal:
+                return index
+            if jump_vertical(row, col, 1) is not None or jump_vertical(row, col, -1) is not None:
+                return index
+
+    # Directions to scan from index, given the direction it was reached in (None at the start)
+    def directions(row, col, direction):
+        if direction is None:
+            return [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        drow, dcol = direction
+        if dcol != 0:
+            return [(0, dcol), (1, 0), (-1, 0)]
+        forced = [(0, side) for side in (-1, 1) if free(row, col + side) and not free(row - drow, col + side)]
+        return [(drow, 0)] + forced
+
+    def heuristic(index):
+        row, col = divmod(index, cols)
+        return (abs(goal_col - col) + abs(goal_row - row)) * step_cost
+
+    g_score = {start: 0.0}
+    came_from = {start: None}
+    arrived = {start: None}  # Direction each jump point was reached in
+    closed = set()
+    counter = 0
+    h = heuristic(start)
+    open_set = [(h, h, counter, start)]
+
+    while open_set:
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+
+        _, _, _, current = heapq.heappop(open_set)
+        if current in closed:
+            continue
+        if current == goal:
+            return _unroll(came_from, current, cols)
+        closed.add(current)
+
+        row, col = divmod(current, cols)
+        for drow, dcol in directions(row, col, arrived[current]):
+            if drow != 0:
+                jump_point = jump_vertical(row, col, drow)
+            else:
+                jump_point = jump_horizontal(row, col, dcol)
+            if jump_point is None or jump_point in closed:
+                continue
+            jump_row, jump_col = divmod(jump_point, cols)
+            temp_g_score = g_score[current] + (abs(jump_row - row) + abs(jump_col - col)) * step_cost
+            if temp_g_score < g_score.get(jump_point, float('inf')):
+                g_score[jump_point] = temp_g_score
+                came_from[jump_point] = current
+                arrived[jump_point] = (drow, dcol)
+                h = heuristic(jump_point)
+                counter += 1
+                heapq.heappush(open_set, (temp_g_score + h, h, counter, jump_point))
+                if on_push is not None:
+                    on_push(jump_point)
+
+    return None
+
+
+# Expands the chain of jump points ending at index into every cell in between
+def _unroll(came_from, index, cols):
+    jump_points = []
+    while index is not None:
+        jump_points.append(index)
+        index = came_from[index]
+    jump_points.reverse()
+
+    path = [jump_points[0]]
+    for previous, current in zip(jump_points, jump_points[1:]):
+        step = cols if abs(current - previous) >= cols else 1
+        step = step if current > previous else -step
+        path.extend(range(previous + step, current + step, step))
+    return np.array(path, dtype=np.int64)
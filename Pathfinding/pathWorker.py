@@ -0,0 +1,144 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import threading
+import numpy as np
+from routingGrid import SearchCancelled
+from routeOptimizer import plan_route
+from searchEngines import SEARCH_ENGINES, READING_ENGINES, prepare_engine, refresh_engine
+from searchVisualizer import FrontierRecorder
+from runStats import RunStats, ProfileCapture
+
+
+# Cooperative cancellation flag shared between the GUI and a running search
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class RouteJob:
+    def __init__(self, job_id, grid, start, goals, mode, optimize=False, engine="astar", stats=None, profile=False):
+        self.job_id = job_id
+        self.grid = grid  # RoutingGrid snapshot owned by the job
+        self.start = start
+        self.goals = goals
+        self.mode = mode
+        self.optimize = optimize  # Reorder goals for the cheapest total route instead of click order
+        self.engine = engine  # Key of searchEngines.SEARCH_ENGINES used for each leg
+        self.stats = stats if stats is not None else RunStats()  # Filled in by the worker as it searches
+        self.profile = profile  # Run the search under a ProfileCapture
+        self.token = CancellationToken()
+
+
+# Runs route searches off the GUI thread. Only the latest submitted job is kept: submitting
+# cancels the running job and replaces any job still waiting.
+class PathWorker(QThread):
+    frontier = pyqtSignal(int, list, list)  # job id, opened indices, closed indices
+    routeFound = pyqtSignal(int, list, object)  # job id, one index array per leg in visiting order, cells the search read
+    routeFailed = pyqtSignal(int, int)  # job id, index of the unreachable goal in the submitted goals
+    routeCancelled = pyqtSignal(int)  # job id
+
+    def __init__(self):
+        super().__init__()
+        self.condition = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.next_job_id = 0
+        self.shutting_down = False
+
+    # Queues a search on a snapshot of grid. Returns the job id used in the signals.
+    def submit(self, grid, start, goals, mode, optimize=False, engine="astar", stats=None, profile=False):
+        prepare_engine(grid, engine)
+        with self.condition:
+            self.next_job_id += 1
+            job = RouteJob(self.next_job_id, grid.snapshot(), start, list(goals), mode, optimize, engine, stats, profile)
+            if self.current is not None:
+                self.current.token.cancel()
+            self.pending = job
+            self.condition.notify()
+        if not self.isRunning():
+            self.start()
+        return job.job_id
+
+    # Cancels the running job and drops any waiting one
+    def cancel(self):
+        with self.condition:
+            if self.current is not None:
+                self.current.token.cancel()
+            if self.pending is not None:
+                self.routeCancelled.emit(self.pending.job_id)
+                self.pending = None
+
+    def shutdown(self):
+        with self.condition:
+            self.shutting_down = True
+            self.condition.notify()
+        self.cancel()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.shutting_down:
+                    self.condition.wait()
+                if self.shutting_down:
+                    return
+                job = self.current = self.pending
+                self.pending = None
+
+            self.run_job(job)
+
+            with self.condition:
+                self.current = None
+
+    def run_job(self, job):
+        if job.profile:
+            with ProfileCapture(job.stats):
+                self.search_job(job)
+        else:
+            self.search_job(job)
+
+    def search_job(self, job):
+        recorder = FrontierRecorder(job.mode, lambda opened, closed: self.frontier.emit(job.job_id, opened, closed), job.token)
+        search = SEARCH_ENGINES[job.engine]
+        reads = job.engine in READING_ENGINES
+        stats = job.stats
+        segments = []
+        current_start = job.start
+        try:
+            order = list(range(len(job.goals)))
+            settled = np.empty(0, dtype=np.int64)
+            with stats.phase("prepare"):
+                refresh_engine(job.grid, job.engine)
+            if job.optimize:
+                with stats.phase("optimize"):
+                    order, settled = plan_route(job.grid, job.start, job.goals, recorder.should_stop)
+            for goal_index in order:
+                goal = job.goals[goal_index]
+                with stats.phase("search"):
+                    segment = search(job.grid, current_start, goal, **recorder.callbacks(reads))
+                    recorder.finish_leg()
+                if segment is None:
+                    self.count(stats, recorder)
+                    self.routeFailed.emit(job.job_id, goal_index)
+                    return
+                segments.append(segment)
+                current_start = goal
+        except SearchCancelled:
+            self.routeCancelled.emit(job.job_id)
+            return
+        self.count(stats, recorder)
+        # An optimized order also depends on every cell read while costing the legs, and HPA* legs
+        # on the clusters they crossed
+        touched = job.grid.neighborhood(np.concatenate([np.asarray(recorder.expanded, dtype=np.int64), settled] + recorder.read))
+        self.routeFound.emit(job.job_id, segments, touched)
+
+    def count(self, stats, recorder):
+        stats.count("expanded", len(recorder.expanded))
+        stats.count("pushed", recorder.pushed)
+        stats.count("reopened", recorder.reopened)
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+import numpy as np
+from routingGrid import COST_SCALE, TRAVERSABLE
+
+
+class RouteEntry:
+    def __init__(self, segments, touched, leg_costs):
+        self.segments = segments  # One index array per leg
+        self.touched = touched  # Sorted cells the search read: expanded cells and their neighbors
+        self.leg_costs = leg_costs  # Cost of each leg when it was cached
+        self.directions = None  # Generated directions text, filled in once available
+
+
+# LRU cache of routes for one routing grid. An edit drops the entries whose touched cells include
+# the edited one. A cell elsewhere that got cheaper (or traversable) could still open a cheaper
+# route, so it also drops the entries with a leg that a route through it might beat.
+class RouteCache:
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.grid = None
+        self.costs = None  # Grid costs and traversability as of the last edit seen
+        self.walkable = None
+
+    # Binds the cache to a grid, dropping everything cached for the previous one
+    def attach(self, grid):
+        if self.grid is not None and self.invalidate in self.grid.edit_listeners:
+            self.grid.edit_listeners.remove(self.invalidate)
+        self.grid = grid
+        grid.edit_listeners.append(self.invalidate)
+        self.costs = grid.costs.copy()
+        self.walkable = TRAVERSABLE[grid.types]
+        self.entries.clear()
+
+    # Optimized routes don't depend on the goals' click order, so their goals are sorted.
+    # Engines find equally cheap routes but not always the same cells, so each has its own entries.
+    @staticmethod
+    def key(start, goals, cost_scale=COST_SCALE, optimize=False, engine="astar"):
+        goals = tuple(int(goal) for goal in goals)
+        return (int(start), tuple(sorted(goals)) if optimize else goals, cost_scale, optimize, engine)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, segments, touched):
+        leg_costs = [float(self.grid.costs[segment[1:]].astype(np.float64).sum()) / COST_SCALE for segment in segments]
+        self.entries[key] = RouteEntry(segments, touched, leg_costs)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def set_directions(self, key, directions):
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.directions = directions
+
+    # Edit listener: index is the edited cell or an array of them, or None when the whole grid changed
+    def invalidate(self, index):
+        grid = self.grid
+        if index is None:
+            self.entries.clear()
+            self.costs = grid.costs.copy()
+            self.walkable = TRAVERSABLE[grid.types]
+            return
+        cells = np.atleast_1d(index)
+        walkable = TRAVERSABLE[grid.types[cells]]
+        cheaper = cells[walkable & (~self.walkable[cells] | (grid.costs[cells] < self.costs[cells]))]
+        self.costs[cells] = grid.costs[cells]
+        self.walkable[cells] = walkable
+
+        stale = []
+        for key, entry in self.entries.items():
+            if len(entry.touched):
+                positions = np.minimum(np.searchsorted(entry.touched, cells), len(entry.touched) - 1)
+                if (entry.touched[positions] == cells).any():
+                    stale.append(key)
+                    continue
+            if cheaper.size and self.could_beat(key, entry, cheaper):
+                stale.append(key)
+        for key in stale:
+            del self.entries[key]
+
+    # Whether a route through one of the cheaper cells might cost less than a cached leg: every
+    # step costs at least the grid's cheapest step, so a leg through cell costs at least its
+    # Manhattan detour times that. Optimized routes go stale on any cheaper cell, since it may
+    # make another visiting order cheaper.
+    def could_beat(self, key, entry, cheaper):
+        if key[3]:
+            return True
+        cols = self.grid.cols
+        step_cost = self.grid.min_step_cost()
+        cheaper_rows, cheaper_cols = np.divmod(cheaper, cols)
+        for segment, leg_cost in zip(entry.segments, entry.leg_costs):
+            start_row, start_col = divmod(int(segment[0]), cols)
+            goal_row, goal_col = divmod(int(segment[-1]), cols)
+            detour = (np.abs(cheaper_rows - start_row) + np.abs(cheaper_cols - start_col)
+                      + np.abs(cheaper_rows - goal_row) + np.abs(cheaper_cols - goal_col))
+            if (detour * step_cost < leg_cost).any():
+                return True
+        return False
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,116 @@
+import numpy as np
+
+UNNAMED_STREET = "Unnamed Road"
+# Street runs shorter than this between two other segments are treated as a crossing, not a turn
+MIN_SEGMENT_CELLS = 5
+
+HEADINGS = {(-1, 0): "north", (1, 0): "south", (0, 1): "east", (0, -1): "west"}
+
+
+def _street(grid, index):
+    name = grid.street_name(index).strip()
+    return name if name else UNNAMED_STREET
+
+
+# Dominant unit step (drow, dcol) between two cells
+def _heading(start, end):
+    drow = end[0] - start[0]
+    dcol = end[1] - start[1]
+    if drow == 0 and dcol == 0:
+        return None
+    if abs(drow) >= abs(dcol):
+        return (1 if drow > 0 else -1, 0)
+    return (0, 1 if dcol > 0 else -1)
+
+
+# Turn from one heading to the next. Rows grow downwards, so a positive cross product is a right turn.
+def _turn(previous, current):
+    if previous is None or current is None or previous == current:
+        return "straight"
+    cross = previous[1] * current[0] - previous[0] * current[1]
+    if cross > 0:
+        return "right"
+    if cross < 0:
+        return "left"
+    return "u-turn"
+
+
+# Merges consecutive path cells on the same street into segments. Each segment is a dict with
+# street, length (cells), start/end [row, col] (start is where the street changes), heading,
+# turn (relative to the previous segment) and crosses (short streets passed straight through).
+def compress_route(grid, path):
+    path = [int(index) for index in np.asarray(path).tolist()]
+    if not path:
+        return []
+
+    runs = []
+    for index in path:
+        street = _street(grid, index)
+        if runs and runs[-1]["street"] == street:
+            runs[-1]["cells"].append(index)
+        else:
+            runs.append({"street": street, "cells": [index], "crosses": []})
+
+    # Fold short interior runs (intersections) into the run before them
+    merged = []
+    for i, run in enumerate(runs):
+        interior = 0 < i < len(runs) - 1
+        if merged and interior and len(run["cells"]) < MIN_SEGMENT_CELLS:
+            merged[-1]["cells"].extend(run["cells"])
+            merged[-1]["crosses"].append(run["street"])
+        elif merged and merged[-1]["street"] == run["street"]:
+            merged[-1]["cells"].extend(run["cells"])
+            merged[-1]["crosses"].extend(run["crosses"])
+        else:
+            merged.append(run)
+
+    segments = []
+    previous_heading = None
+    for run in merged:
+        start = list(grid.position(run["cells"][0]))
+        end = list(grid.position(run["cells"][-1]))
+        # Measure the heading from the last cell of the previous segment so one-cell runs still have one
+        origin = segments[-1]["end"] if segments else start
+        heading = _heading(origin, end) or previous_heading
+        segments.append({
+            "street": run["street"],
+            "length": len(run["cells"]),
+            "start": start,
+            "end": end,
+            "heading": HEADINGS.get(heading, "north"),
+            "turn": None if not segments else _turn(previous_heading, heading),
+            "crosses": sorted(set(run["crosses"]), key=run["crosses"].index)
+        })
+        previous_heading = heading
+    return segments
+
+
+# Template-based directions from compressed segments, no network needed
+def describe_route(segments):
+    if not segments:
+        return "No path found."
+
+    lines = []
+    for segment in segments:
+        crossing = f", crossing {', '.join(segment['crosses'])}" if segment["crosses"] else ""
+        if segment["turn"] is None:
+            line = f"Head {segment['heading']} on {segment['street']} for {segment['length']} cells{crossing}."
+        elif segment["turn"] == "straight":
+            line = f"Continue {segment['heading']} onto {segment['street']} for {segment['length']} cells{crossing}."
+        elif segment["turn"] == "u-turn":
+            line = f"Make a U-turn onto {segment['street']} and continue for {segment['length']} cells{crossing}."
+        else:
+            line = f"Turn {segment['turn']} onto {segment['street']} and continue {segment['heading']} for {segment['length']} cells{crossing}."
+        lines.append(line)
+    lines.append("Arrive at destination.")
+    return "\n".join(f"{number}. {line}" for number, line in enumerate(lines, 1))
+
+
+# Compact one-line-per-segment text used as the LLM prompt payload
+def segments_text(segments):
+    return "\n".join(
+        f"{segment['street']} | turn: {segment['turn'] or 'start'} | heading: {segment['heading']} | "
+        f"{segment['length']} cells | from ({segment['start'][0]}, {segment['start'][1]})"
+        + (f" | crosses: {', '.join(segment['crosses'])}" if segment["crosses"] else "")
+        for segment in segments
+    )
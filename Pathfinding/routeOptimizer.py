@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from routingGrid import RoutingGrid, SearchCancelled, astar, dijkstra
+
+# Up to this many goals the visiting order is solved exactly with Held-Karp (O(2^n * n^2)),
+# beyond it nearest neighbor followed by 2-opt and Or-opt passes
+HELD_KARP_LIMIT = 12
+OR_OPT_LENGTHS = (1, 2, 3)
+# Fewer sources than this are searched in-process, the pool startup isn't worth it
+POOL_MIN_SOURCES = 4
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+# One process pool per process, started on first use. Spawned rather than forked since the
+# GUI calls it from a QThread.
+def shared_pool():
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _shared_pool
+
+
+# Worker side: rebuilds the grid from its layers once, then runs one Dijkstra per source.
+# Returns the cost rows and a mask of every cell the searches settled.
+def _search_chunk(rows, cols, types, costs, sources, targets):
+    grid = RoutingGrid(rows, cols, types, costs)
+    cost_rows = []
+    settled = np.zeros(grid.size, dtype=bool)
+    for source in sources:
+        distances, _ = dijkstra(grid, source, targets)
+        cost_rows.append(distances[targets])
+        settled |= np.isfinite(distances)
+    return cost_rows, settled
+
+
+# Cost of the cheapest path from every source to every target, as a (sources, targets) array
+# with inf for unreachable pairs. Each source gets one Dijkstra that stops once all targets are
+# settled; the searches are split across the process pool when there are enough of them.
+# Also returns the sorted cells the searches settled.
+def leg_costs(grid, sources, targets, should_stop=None, workers=None):
+    sources = [int(source) for source in sources]
+    targets = np.asarray(targets, dtype=np.int64)
+    workers = workers if workers is not None else os.cpu_count() or 1
+    if workers <= 1 or len(sources) < POOL_MIN_SOURCES:
+        cost_rows = []
+        settled = np.zeros(grid.size, dtype=bool)
+        for source in sources:
+            distances, _ = dijkstra(grid, source, targets, should_stop)
+            cost_rows.append(distances[targets])
+            settled |= np.isfinite(distances)
+        return np.array(cost_rows), np.flatnonzero(settled)
+
+    chunks = [sources[i::workers] for i in range(min(workers, len(sources)))]
+    pool = shared_pool()
+    futures = {pool.submit(_search_chunk, grid.rows, grid.cols, grid.types, grid.costs, chunk, targets): chunk for chunk in chunks}
+    pending = set(futures)
+    while pending:
+        _, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+        if should_stop is not None and should_stop():
+            for future in pending:
+                future.cancel()
+            raise SearchCancelled()
+
+    costs = np.empty((len(sources), len(targets)), dtype=np.float64)
+    settled = np.zeros(grid.size, dtype=bool)
+    positions = {source: position for position, source in enumerate(sources)}
+    for future, chunk in futures.items():
+        cost_rows, chunk_settled = future.result()
+        for source, row in zip(chunk, cost_rows):
+            costs[positions[source]] = row
+        settled |= chunk_settled
+    return costs, np.flatnonzero(settled)
+
+
+# Total cost of visiting stops in order. costs[0] is the start's row, costs[i][j] the leg from
+# stop i to stop j (stops numbered from 1, column j - 1).
+def _order_cost(costs, order):
+    total = costs[0][order[0] - 1]
+    for previous, stop in zip(order, order[1:]):
+        total += costs[previous][stop - 1]
+    return total
+
+
+# Exact open-path order by dynamic programming over subsets of stops
+def _held_karp(costs):
+    n = costs.shape[1]
+    legs = costs[1:]  # legs[i][j]: stop i + 1 to stop j + 1
+    best = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    best[1 << np.arange(n), np.arange(n)] = costs[0]
+    for mask in range(1, 1 << n):
+        candidates = best[mask][:, None] + legs  # From each last stop in mask to each next stop
+        last = np.argmin(candidates, axis=0)
+        values = candidates[last, np.arange(n)]
+        for stop in range(n):
+            if mask & (1 << stop):
+                continue
+            extended = mask | (1 << stop)
+            if values[stop] < best[extended, stop]:
+                best[extended, stop] = values[stop]
+                parent[extended, stop] = last[stop]
+
+    mask = (1 << n) - 1
+    if not np.isfinite(best[mask]).any():
+        return _nearest_neighbor(costs)  # Some stop is unreachable, any order fails the same way
+    stop = int(np.argmin(best[mask]))
+    order = []
+    while stop != -1:
+        order.append(stop + 1)
+        stop, mask = int(parent[mask, stop]), mask & ~(1 << stop)
+    order.reverse()
+    return order
+
+
+def _nearest_neighbor(costs):
+    n = costs.shape[1]
+    unvisited = set(range(1, n + 1))
+    order = []
+    row = costs[0]
+    while unvisited:
+        stop = min(unvisited, key=lambda candidate: row[candidate - 1])
+        order.append(stop)
+        unvisited.remove(stop)
+        row = costs[stop]
+    return order
+
+
+# Improves order in place with 2-opt (reverse a run) and Or-opt (move a run of up to three stops)
+# until neither finds a cheaper order. Costs may be asymmetric, so every move is costed in full.
+def _improve(costs, order):
+    costs = costs.tolist()
+    best_cost = _order_cost(costs, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 2, len(order) + 1):
+                candidate = order[:i] + order[i:j][::-1] + order[j:]
+                cost = _order_cost(costs, candidate)
+                if cost < best_cost:
+                    order, best_cost, improved = candidate, cost, True
+        for length in OR_OPT_LENGTHS:
+            for i in range(len(order) - length + 1):
+                run = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    candidate = rest[:j] + run + rest[j:]
+                    cost = _order_cost(costs, candidate)
+                    if cost < best_cost:
+                        order, best_cost, improved = candidate, cost, True
+                        break
+    return order
+
+
+# Visiting order for the goals given the costs from leg_costs([start] + goals, goals).
+# Returns positions into goals.
+def solve_order(costs):
+    if costs.shape[1] <= HELD_KARP_LIMIT:
+        order = _held_karp(costs)
+    else:
+        order = _improve(costs, _nearest_neighbor(costs))
+    return [stop - 1 for stop in order]
+
+
+# Picks the cheapest order to visit goals from start. Returns (order, settled): positions into
+# goals, and the cells read to cost the legs.
+def plan_route(grid, start, goals, should_stop=None, workers=None):
+    goals = [int(goal) for goal in goals]
+    if len(goals) < 2:
+        return list(range(len(goals))), np.empty(0, dtype=np.int64)
+    costs, settled = leg_costs(grid, [start] + goals, goals, should_stop, workers)
+    return solve_order(costs), settled
+
+
+# Headless multi-stop route: plans the order, then stitches one A* leg per goal.
+# Returns (order, full index path) or (order, None) if a goal can't be reached.
+def optimized_route(grid, start, goals, workers=None, **callbacks):
+    order, _ = plan_route(grid, start, goals, callbacks.get("should_stop"), workers)
+    full_path = [np.array([start], dtype=np.int64)]
+    current_start = start
+    for position in order:
+        segment = astar(grid, current_start, goals[position], **callbacks)
+        if segment is None:
+            return order, None
+        full_path.append(segment[1:])
+        current_start = goals[position]
+    return order, np.concatenate(full_path)
@@ -0,0 +1,447 @@
+import copy
+import csv
+import heapq
+import numpy as np
+
+# Cell types, stored as uint8 codes. Order matches the application's color_map.
+CELL_TYPES = ["closed", "reset2", "reset3", "path_point", "goal", "reset", "start", "barrier", "reset1", "open"]
+TYPE_CODES = {name: code for code, name in enumerate(CELL_TYPES)}
+
+# Types a path is allowed to step onto
+TRAVERSABLE_TYPES = frozenset(["reset", "goal", "reset1", "reset2", "reset3"])
+TRAVERSABLE = np.array([name in TRAVERSABLE_TYPES for name in CELL_TYPES], dtype=bool)
+TRAVERSABLE.flags.writeable = False
+
+# Moving into a cell costs cell.cost / COST_SCALE
+COST_SCALE = 80
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+# Headless grid state held in flat arrays indexed by row * cols + col. Layers may be passed in
+# (e.g. memory-mapped from a .navgrid file), otherwise every cell starts as 'reset' with cost 1.
+class RoutingGrid:
+    def __init__(self, rows, cols, types=None, costs=None, street_ids=None, street_names=None):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.types = types if types is not None else np.full(self.size, TYPE_CODES['reset'], dtype=np.uint8)
+        self.costs = costs if costs is not None else np.ones(self.size, dtype=np.float32)
+        self.street_ids = street_ids if street_ids is not None else np.zeros(self.size, dtype=np.uint16)
+        self.street_names = list(street_names) if street_names else [""]  # Street id -> name, id 0 is unnamed
+        self.street_lookup = {name: street_id for street_id, name in enumerate(self.street_names)}
+
+        # Fixed-capacity CSR adjacency: cell i's neighbors are
+        # neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i] + neighbor_counts[i]]
+        self.neighbor_offsets = np.arange(self.size + 1, dtype=np.int64) * 4
+        self.neighbor_counts = np.zeros(self.size, dtype=np.uint8)
+        self.neighbor_indices = np.full(self.size * 4, -1, dtype=np.int32)
+        self._neighbor_lists = None  # Python list view used by the search loop
+        self._move_costs = None
+        self._step_cost = None
+        self._workspace = None
+        self.hierarchy = None  # HPA* cluster graph, created by hpaSearch on first use
+
+        # Bumped on every change. Listeners are called with the edited cell index, an array of
+        # edited cells for bulk edits, or None when the whole grid changed at once.
+        self.version = 0
+        self.edit_listeners = []
+        self.build_adjacency()
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def position(self, index):
+        return divmod(int(index), self.cols)
+
+    # Returns the id for a street name, adding it to the string table if new
+    def intern_street(self, name):
+        street_id = self.street_lookup.get(name)
+        if street_id is None:
+            street_id = len(self.street_names)
+            if street_id > np.iinfo(self.street_ids.dtype).max:
+                raise ValueError(f"Can't add street {name!r}, street ids are {self.street_ids.dtype} and all {street_id} are used")
+            self.street_names.append(name)
+            self.street_lookup[name] = street_id
+        return street_id
+
+    def street_name(self, index):
+        return self.street_names[self.street_ids[index]]
+
+    # Updates one cell, patching the adjacency of its neighbors if traversability changed
+    def set_cell(self, row, col, cell_type, cost, street_name):
+        index = self.index(row, col)
+        type_code = TYPE_CODES[cell_type]
+        street_id = self.intern_street(street_name)
+        old_type = self.types[index]
+        if old_type == type_code and self.costs[index] == np.float32(cost) and self.street_ids[index] == street_id:
+            return
+
+        self.types[index] = type_code
+        self.costs[index] = cost
+        self.street_ids[index] = street_id
+        if self._move_costs is not None:
+            self._move_costs[index] = float(self.costs[index]) / COST_SCALE
+        if self._step_cost is not None and TRAVERSABLE[type_code]:
+            self._step_cost = min(self._step_cost, float(self.costs[index]) / COST_SCALE)
+        if TRAVERSABLE[type_code] != TRAVERSABLE[old_type]:
+            self.update_adjacency(self.adjacent_cells(index))
+        self.notify_edit(index)
+
+    def notify_edit(self, index=None):
+        self.version += 1
+        for listener in self.edit_listeners:
+            listener(index)
+
+    # All in-bounds cells orthogonally adjacent to index, regardless of type
+    def adjacent_cells(self, index):
+        row, col = divmod(int(index), self.cols)
+        cells = []
+        if row < self.rows - 1:
+            cells.append(index + self.cols)
+        if row > 0:
+            cells.append(index - self.cols)
+        if col < self.cols - 1:
+            cells.append(index + 1)
+        if col > 0:
+            cells.append(index - 1)
+        return cells
+
+    # Full rebuild after bulk changes to the layers
+    def build_adjacency(self):
+        self.update_adjacency(np.arange(self.size))
+        self._neighbor_lists = None
+        self._step_cost = None
+        self.notify_edit()
+
+    # Sorted unique cells in the given set plus everything orthogonally adjacent to them
+    def neighborhood(self, cells):
+        cells = np.asarray(cells, dtype=np.int64)
+        rows, cols = np.divmod(cells, self.cols)
+        parts = [cells, cells[rows < self.rows - 1] + self.cols, cells[rows > 0] - self.cols, cells[cols < self.cols - 1] + 1, cells[cols > 0] - 1]
+        return np.unique(np.concatenate(parts))
+
+    # Recomputes the neighbor slots of the given cells, checked DOWN, UP, RIGHT, LEFT
+    def update_adjacency(self, cells):
+        cells = np.asarray(cells, dtype=np.int64)
+        if cells.size == 0:
+            return
+        traversable = TRAVERSABLE[self.types]
+        rows, cols = np.divmod(cells, self.cols)
+        counts = np.zeros(cells.size, dtype=np.uint8)
+        slots = self.neighbor_offsets[cells]
+        for step, in_bounds in (
+            (self.cols, rows < self.rows - 1),
+            (-self.cols, rows > 0),
+            (1, cols < self.cols - 1),
+            (-1, cols > 0),
+        ):
+            targets = cells + step
+            valid = in_bounds.copy()
+            valid[in_bounds] = traversable[targets[in_bounds]]
+            self.neighbor_indices[slots[valid] + counts[valid]] = targets[valid]
+            counts[valid] += 1
+        self.neighbor_counts[cells] = counts
+        for slot in range(4):
+            unused = counts <= slot
+            self.neighbor_indices[slots[unused] + slot] = -1
+
+        if self._neighbor_lists is not None:
+            for cell, start, count in zip(cells.tolist(), slots.tolist(), counts.tolist()):
+                self._neighbor_lists[cell] = self.neighbor_indices[start:start + count].tolist()
+
+    def neighbors(self, index):
+        start = int(self.neighbor_offsets[index])
+        return self.neighbor_indices[start:start + int(self.neighbor_counts[index])]
+
+    # Per-cell neighbor lists for the search loop, built once and kept in sync by update_adjacency
+    def neighbor_lists(self):
+        if self._neighbor_lists is None:
+            padded = self.neighbor_indices.reshape(self.size, 4).tolist()
+            self._neighbor_lists = [slots[:count] for slots, count in zip(padded, self.neighbor_counts.tolist())]
+        return self._neighbor_lists
+
+    # Cost of stepping into each cell, as a Python list for the search loop
+    def move_costs(self):
+        if self._move_costs is None:
+            self._move_costs = (self.costs.astype(np.float64) / COST_SCALE).tolist()
+        return self._move_costs
+
+    # Lower bound on the cost of one step, so a Manhattan distance scaled by it never overestimates.
+    # Raising a cell's cost leaves the bound lower than needed, which is still admissible.
+    def min_step_cost(self):
+        if self._step_cost is None:
+            costs = self.costs[TRAVERSABLE[self.types]]
+            self._step_cost = float(costs.min()) / COST_SCALE if costs.size else 1.0
+        return self._step_cost
+
+    # The cost of every step if all traversable cells cost the same, otherwise None
+    def uniform_step_cost(self):
+        costs = self.costs[TRAVERSABLE[self.types]]
+        if costs.size == 0 or costs.min() != costs.max():
+            return None
+        return float(costs[0]) / COST_SCALE
+
+    # Independent copy for searching on another thread. The outer neighbor/cost lists are
+    # copied shallowly since updates replace their entries rather than mutating them.
+    def snapshot(self):
+        grid = copy.copy(self)
+        grid.types = self.types.copy()
+        grid.costs = self.costs.copy()
+        grid.street_ids = self.street_ids.copy()
+        grid.street_names = list(self.street_names)
+        grid.street_lookup = dict(self.street_lookup)
+        grid.neighbor_counts = self.neighbor_counts.copy()
+        grid.neighbor_indices = self.neighbor_indices.copy()
+        grid._neighbor_lists = list(self.neighbor_lists())
+        grid._move_costs = list(self.move_costs())
+        grid._workspace = None
+        grid.edit_listeners = []
+        return grid
+
+    # Search scratch space, allocated on first use and reused by every query
+    def workspace(self):
+        if self._workspace is None:
+            self._workspace = SearchWorkspace(self.size)
+        return self._workspace
+
+    # Replaces the costs of cells at once, or of every cell (e.g. when switching cost profiles).
+    # Traversability doesn't change, so neither does the adjacency.
+    def set_costs(self, costs, cells=None):
+        if cells is None:
+            self.costs[:] = costs
+            self._move_costs = None
+            self._step_cost = None
+            self.notify_edit()
+            return
+
+        cells = np.asarray(cells, dtype=np.int64)
+        self.costs[cells] = costs
+        new_costs = self.costs[cells].astype(np.float64) / COST_SCALE
+        if self._move_costs is not None:
+            for cell, move_cost in zip(cells.tolist(), new_costs.tolist()):
+                self._move_costs[cell] = move_cost
+        traversable = TRAVERSABLE[self.types[cells]]
+        if self._step_cost is not None and traversable.any():
+            self._step_cost = min(self._step_cost, float(new_costs[traversable].min()))
+        self.notify_edit(cells)
+
+    # Moves cells onto one street, e.g. to rename a street
+    def set_streets(self, cells, street_name):
+        cells = np.asarray(cells, dtype=np.int64)
+        self.street_ids[cells] = self.intern_street(street_name)
+        self.notify_edit(cells)
+
+    # Replaces all cell layers at once and rebuilds the adjacency
+    def load_cells(self, cell_types, costs, street_names):
+        self.types[:] = [TYPE_CODES[cell_type] for cell_type in cell_types]
+        self.costs[:] = costs
+        self.street_ids[:] = [self.intern_street(name) for name in street_names]
+        self._move_costs = None
+        self._step_cost = None
+        self.build_adjacency()
+
+    # Builds a routing grid from the GUI's 2D list of Node items
+    @classmethod
+    def from_nodes(cls, nodes):
+        rows = len(nodes)
+        cols = len(nodes[0]) if rows else 0
+        grid = cls(rows, cols)
+        cells = [node for row in nodes for node in row]
+        grid.load_cells([node.type for node in cells], [node.cost for node in cells], [node.streetName for node in cells])
+        return grid
+
+    # Loads a grid exported by GridFileManager without needing Qt. Returns (grid, businesses)
+    @classmethod
+    def from_csv(cls, file_path):
+        with open(file_path, 'r') as file:
+            lines = list(csv.reader(file))
+        businesses = parse_businesses(lines[0]) if lines else []
+        lines = lines[1:]
+        cols = len(lines[0]) if lines else 0
+        grid = cls(len(lines), cols)
+        cell_types, costs, street_names = [], [], []
+        for row_idx, row in enumerate(lines):
+            row = row[:cols] + [""] * (cols - len(row))  # Rows are as wide as the first one
+            for col_idx, cell in enumerate(row):
+                # A malformed cell is logged and loaded as an empty one, like the rest of the file
+                try:
+                    parts = cell.split(":")
+                    cell_type = parts[0]
+                    if cell_type not in TYPE_CODES:
+                        raise ValueError(f"unknown type {cell_type!r}")
+                    cost = float(parts[2])
+                    street_name = parts[3] if len(parts) > 3 else ""
+                except (IndexError, ValueError) as e:
+                    print(f"Error parsing cell ({row_idx}, {col_idx}) {cell!r}: {e}")
+                    cell_type, cost, street_name = 'reset', 1.0, ""
+                cell_types.append(cell_type)
+                costs.append(cost)
+                street_names.append(street_name)
+        grid.load_cells(cell_types, costs, street_names)
+        return grid, businesses
+
+
+# Preallocated search scratch space shared by queries on one grid. An entry is only valid
+# when its stamp matches the current generation, so nothing is cleared between queries.
+class SearchWorkspace:
+    def __init__(self, size):
+        self.g_score = [0.0] * size
+        self.came_from = [-1] * size
+        self.seen = [0] * size  # Generation in which g_score/came_from were last written
+        self.closed = [0] * size  # Generation in which the cell was expanded
+        self.generation = 0
+
+    def next_generation(self):
+        self.generation += 1
+        return self.generation
+
+    # Follows came_from back from index. Returns the path in start -> index order.
+    def path_to(self, index):
+        path = [index]
+        while self.came_from[index] != -1:
+            index = self.came_from[index]
+            path.append(index)
+        path.reverse()
+        return np.array(path, dtype=np.int64)
+
+
+# Parses the business header row of a grid file into (name, x, y, score) tuples
+def parse_businesses(businesses_line):
+    businesses = []
+    i = 0
+    while i < len(businesses_line):
+        try:
+            name = businesses_line[i].strip()
+            x = int(businesses_line[i + 1].strip())
+            y = int(businesses_line[i + 2].strip())
+            score = float(businesses_line[i + 3].strip())
+            if score == 0.0:
+                print(f"Error business {name} has a score of 0.0")
+            businesses.append((name, x, y, score))
+        except Exception as e:
+            print(f"Error parsing business at index {i}: {e}")
+        i += 4  # Move to the next set
+    return businesses
+
+
+# A* from start to goal over cell indices. Returns the path (start and goal included) as an
+# index array, or None if the goal can't be reached. on_push/on_close are called with cell
+# indices for visualization, should_stop is polled once per expansion.
+def astar(grid, start, goal, on_push=None, on_close=None, should_stop=None):
+    neighbor_lists = grid.neighbor_lists()
+    move_costs = grid.move_costs()
+    cols = grid.cols
+    goal_row, goal_col = divmod(goal, cols)
+    step_cost = grid.min_step_cost()
+
+    # Manhattan distance in steps, scaled to the cheapest step so paths stay optimal
+    def heuristic(index):
+        row, col = divmod(index, cols)
+        return (abs(goal_col - col) + abs(goal_row - row)) * step_cost
+
+    workspace = grid.workspace()
+    generation = workspace.next_generation()
+    g_score = workspace.g_score
+    came_from = workspace.came_from
+    seen = workspace.seen
+    closed = workspace.closed
+
+    g_score[start] = 0.0
+    came_from[start] = -1
+    seen[start] = generation
+    counter = 0
+    h = heuristic(start)
+    open_set = [(h, h, counter, start)]
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    while open_set:
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+
+        _, _, _, current = heappop(open_set)
+        if closed[current] == generation:
+            continue
+
+        if current == goal:
+            return workspace.path_to(current)
+
+        closed[current] = generation
+        current_g = g_score[current]
+        for neighbor in neighbor_lists[current]:
+            temp_g_score = current_g + move_costs[neighbor]
+            if seen[neighbor] != generation or temp_g_score < g_score[neighbor]:
+                seen[neighbor] = generation
+                came_from[neighbor] = current
+                g_score[neighbor] = temp_g_score
+                h = heuristic(neighbor)
+                counter += 1
+                heappush(open_set, (temp_g_score + h, h, counter, neighbor))
+                if on_push is not None:
+                    on_push(neighbor)
+
+        if on_close is not None:
+            on_close(current)
+
+    return None
+
+
+# Dijkstra from source over cell indices, stopping once every cell in targets is settled (or the
+# whole reachable area if targets is None). Returns (distances, came_from) as arrays:
+# distances is inf for cells that weren't settled, came_from is -1 for the source and unsettled cells.
+def dijkstra(grid, source, targets=None, should_stop=None):
+    neighbor_lists = grid.neighbor_lists()
+    move_costs = grid.move_costs()
+    size = grid.size
+    distances = [float('inf')] * size
+    came_from = [-1] * size
+    closed = bytearray(size)
+    remaining = set(int(target) for target in targets) if targets is not None else None
+
+    distances[source] = 0.0
+    open_set = [(0.0, source)]
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    while open_set:
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+
+        current_g, current = heappop(open_set)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+
+        for neighbor in neighbor_lists[current]:
+            temp_g_score = current_g + move_costs[neighbor]
+            if not closed[neighbor] and temp_g_score < distances[neighbor]:
+                distances[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                heappush(open_set, (temp_g_score, neighbor))
+
+    settled = np.frombuffer(closed, dtype=bool)
+    distances = np.array(distances, dtype=np.float64)
+    distances[~settled] = np.inf
+    came_from = np.array(came_from, dtype=np.int32)
+    came_from[~settled] = -1
+    return distances, came_from
+
+
+# Routes through goals in order, chaining one A* per leg. Returns the full index path or None.
+def route(grid, start, goals, **callbacks):
+    full_path = [np.array([start], dtype=np.int64)]
+    current_start = start
+    for goal in goals:
+        segment = astar(grid, current_start, goal, **callbacks)
+        if segment is None:
+            return None
+        full_path.append(segment[1:])
+        current_start = goal
+    return np.concatenate(full_path)
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_FOLDER = 'Pathfinding/cache/stats/'
+COUNTERS = ["expanded", "pushed", "reopened"]
+# Phases in the order a route request goes through them, for the summary
+PHASES = ["neighbors", "setup", "prepare", "optimize", "search", "reconstruct", "visualize", "directions", "ai"]
+PROFILE_TOP = 15  # Functions and allocation sites kept from a profile capture
+
+
+# Counters and wall-clock phase timings for one route request, from Run to its directions.
+# Phases are added from the GUI thread and the search worker, each tagged with its thread.
+class RunStats:
+    def __init__(self, label=""):
+        self.label = label
+        self.created = time.time()
+        self.origin = time.perf_counter()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phases = []  # (name, start, duration, thread name), seconds since origin
+        self.profile = None  # Summary from ProfileCapture, when one ran
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_phase(self, name, start, duration):
+        with self.lock:
+            self.phases.append((name, start - self.origin, duration, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, start, time.perf_counter() - start)
+
+    # Total seconds per phase name; searches run once per leg
+    def totals(self):
+        totals = {}
+        with self.lock:
+            for name, _, duration, _ in self.phases:
+                totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    # Short text for the info panel
+    def summary(self):
+        counters = ", ".join(f"{name} {value}" for name, value in self.counters.items())
+        totals = self.totals()
+        order = PHASES + sorted(set(totals) - set(PHASES))
+        timings = ", ".join(f"{name} {totals[name] * 1000:.1f} ms" for name in order if name in totals)
+        text = f"{self.label}\n{counters}\n{timings}"
+        if self.profile is not None:
+            text += f"\nPeak traced memory {self.profile['peak_kib']:.0f} KiB, profile in {self.profile['path']}"
+        return text
+
+    def to_dict(self):
+        with self.lock:
+            phases = [{"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(duration * 1000, 3), "thread": thread}
+                      for name, start, duration, thread in self.phases]
+            counters = dict(self.counters)
+        return {
+            "label": self.label,
+            "created": self.created,
+            "counters": counters,
+            "phases": phases,
+            "totals_ms": {name: round(total * 1000, 3) for name, total in self.totals().items()},
+            "profile": self.profile,
+        }
+
+    # One line for the console log, so regressions show up in production logs
+    def log_line(self):
+        totals = " ".join(f"{name}={total * 1000:.1f}ms" for name, total in self.totals().items())
+        counters = " ".join(f"{name}={value}" for name, value in self.counters.items())
+        return f"[STATS] {self.label} {counters} {totals}"
+
+    # Chrome trace event format, viewable in chrome://tracing or Perfetto
+    def trace_events(self):
+        process = os.getpid()
+        threads = {}
+        events = []
+        for phase in self.to_dict()["phases"]:
+            thread = threads.setdefault(phase["thread"], len(threads) + 1)
+            events.append({"name": phase["name"], "cat": "route", "ph": "X", "pid": process, "tid": thread,
+                           "ts": round(phase["start_ms"] * 1000), "dur": round(phase["duration_ms"] * 1000)})
+        end = max((event["ts"] + event["dur"] for event in events), default=0)
+        events.append({"name": "counters", "ph": "C", "pid": process, "tid": 1, "ts": end, "args": dict(self.counters)})
+        events.extend({"name": "thread_name", "ph": "M", "pid": process, "tid": thread, "args": {"name": name}}
+                      for name, thread in threads.items())
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"label": self.label}}
+
+    # Writes <name>.json and <name>.trace.json into folder. Returns both paths.
+    def export(self, folder=DEFAULT_FOLDER, name=None):
+        os.makedirs(folder, exist_ok=True)
+        name = name or time.strftime("run_%Y%m%d_%H%M%S", time.localtime(self.created))
+        stats_path = os.path.join(folder, name + ".json")
+        trace_path = os.path.join(folder, name + ".trace.json")
+        with open(stats_path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+        with open(trace_path, 'w') as file:
+            json.dump(self.trace_events(), file)
+        return stats_path, trace_path
+
+
+# Opt-in cProfile and tracemalloc capture around part of a run. The profile is written to a
+# .prof file (for pstats or snakeviz) and summarised into stats.profile. cProfile only sees the
+# thread it runs on; tracemalloc counts allocations from every thread while it is on.
+class ProfileCapture:
+    def __init__(self, stats, folder=DEFAULT_FOLDER):
+        self.stats = stats
+        self.folder = folder
+        self.profiler = cProfile.Profile()
+        self.started_tracing = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        tracemalloc.reset_peak()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, time.strftime("run_%Y%m%d_%H%M%S", time.localtime(self.stats.created)) + ".prof")
+        self.profiler.dump_stats(path)
+        functions = sorted(pstats.Stats(self.profiler).stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        self.stats.profile = {
+            "path": path,
+            "peak_kib": peak / 1024,
+            "top_functions": [{"function": f"{file}:{line}({name})", "calls": calls, "cumulative_ms": round(cumulative * 1000, 3)}
+                              for (file, line, name), (_, calls, _, cumulative, _) in functions],
+            "top_allocations": [{"site": str(statistic.traceback), "kib": round(statistic.size / 1024, 1), "count": statistic.count}
+                                for statistic in allocations],
+        }
+        return False
@@ -0,0 +1,31 @@
+from routingGrid import astar
+from jumpPointSearch import jps
+from hpaSearch import hpa, hierarchy_for
+from bidirectionalSearch import bidirectional_astar
+from incrementalSearch import incremental_astar
+
+# Interchangeable single-leg searches, all called as engine(grid, start, goal, on_push=None,
+# on_close=None, should_stop=None) and returning a path of the same cost as astar
+# jps: jump point search, for maps where every traversable cell costs the same
+# hpa: HPA* over precomputed cluster graphs, for weighted maps
+# bidirectional: A* from both ends at once, meeting in the middle
+# incremental: LPA* that repairs the previous search for the same stops after edits
+SEARCH_ENGINES = {"astar": astar, "jps": jps, "hpa": hpa, "bidirectional": bidirectional_astar,
+                  "incremental": incremental_astar}
+# Engines whose result depends on cells they never expand, reported by an extra on_read callback
+# called with arrays of cells
+READING_ENGINES = {"hpa", "incremental"}
+
+
+# Creates the state an engine keeps between queries on the grid that receives the edits,
+# before the grid is snapshotted for a search
+def prepare_engine(grid, engine):
+    if engine == "hpa":
+        hierarchy_for(grid)
+
+
+# Brings that state up to date with the snapshot about to be searched, so the first leg's
+# timing is the search alone
+def refresh_engine(grid, engine):
+    if engine == "hpa":
+        hierarchy_for(grid).refresh(grid)
@@ -0,0 +1,120 @@
+from PyQt5.QtWidgets import QApplication
+import time
+
+# Execution modes for find_path
+# animate: stream every pushed/closed node to the view at frame rate, paint paths node by node
+# throttled: stream frontier updates every THROTTLE_INTERVAL seconds or THROTTLE_EXPANSIONS expansions
+# instant: no preview while searching, the final path is painted in one batched update
+EXECUTION_MODES = ["animate", "throttled", "instant"]
+ANIMATE_INTERVAL = 1 / 60
+THROTTLE_INTERVAL = 0.05
+THROTTLE_EXPANSIONS = 500
+
+
+# Worker-side collector of search progress. Buffers opened/closed cell indices and hands them
+# to emit(opened, closed) in batches, so the GUI thread repaints at most once per batch.
+# Every expanded cell is also kept in expanded, whatever the mode, and pushes are counted:
+# reopened counts pushes of cells that had already been queued once.
+class FrontierRecorder:
+    def __init__(self, mode, emit, token):
+        self.mode = mode
+        self.emit = emit
+        self.token = token
+        self.opened = []
+        self.closed = []
+        self.expanded = []
+        self.read = []  # Arrays of cells the search read without expanding them
+        self.queued = set()
+        self.pushed = 0
+        self.reopened = 0
+        self.interval = ANIMATE_INTERVAL if mode == "animate" else THROTTLE_INTERVAL
+        self.last_emit = time.perf_counter()
+
+    # Keyword callbacks for routingGrid.astar, plus on_read for engines that take it.
+    # Instant mode only records pushes and expansions.
+    def callbacks(self, reads=False):
+        if self.mode == "instant":
+            callbacks = {"on_push": self.opened.append, "on_close": self.expanded.append, "should_stop": self.should_stop}
+        else:
+            callbacks = {"on_push": self.on_push, "on_close": self.on_close, "should_stop": self.should_stop}
+        if reads:
+            callbacks["on_read"] = self.read.append
+        return callbacks
+
+    # Looked up on each call since flush hands the list to the GUI and starts a new one
+    def on_push(self, index):
+        self.opened.append(index)
+
+    def on_close(self, index):
+        self.expanded.append(index)
+        self.closed.append(index)
+        if len(self.closed) >= THROTTLE_EXPANSIONS and self.mode == "throttled":
+            self.flush()
+        elif time.perf_counter() - self.last_emit >= self.interval:
+            self.flush()
+
+    def should_stop(self):
+        return self.token.cancelled
+
+    def count_pushes(self):
+        known = len(self.queued)
+        self.queued.update(self.opened)
+        self.pushed += len(self.opened)
+        self.reopened += len(self.opened) - (len(self.queued) - known)
+
+    # Flushes at the end of each leg, so a cell queued again by the next leg is not counted as reopened
+    def finish_leg(self):
+        self.flush()
+        self.queued.clear()
+
+    # Emits the buffered batch; instant mode has nothing to preview and only counts it
+    def flush(self):
+        self.count_pushes()
+        if self.mode == "instant":
+            self.opened = []
+        elif self.opened or self.closed:
+            self.emit(self.opened, self.closed)
+            self.opened = []
+            self.closed = []
+        self.last_emit = time.perf_counter()
+
+
+# GUI-side painter for search previews and finished paths
+class SearchVisualizer:
+    def __init__(self, parent, mode, job_id):
+        self.parent = parent
+        self.mode = mode
+        self.job_id = job_id
+
+    # True once a newer route request has replaced the one being painted
+    def superseded(self):
+        return self.parent.route_job_id != self.job_id
+
+    # Applies one batch of frontier updates from the worker in a single repaint
+    def apply_frontier(self, opened, closed):
+        self.parent.view.setUpdatesEnabled(False)
+        for index in opened:
+            self.parent.set_preview_color(self.parent.node_at(index), self.parent.color_map['open'])
+        for index in closed:
+            self.parent.set_preview_color(self.parent.node_at(index), self.parent.color_map['closed'])
+        self.parent.view.setUpdatesEnabled(True)
+
+    # Colors a finished leg from goal back to start. Instant mode only paints the final path.
+    def paint_segment(self, nodes):
+        if self.mode != "instant":
+            self.paint_path(reversed(nodes), self.parent.color_map['path_point'])
+
+    # Colors path nodes, one repaint per node in animate mode and a single batched update otherwise
+    def paint_path(self, nodes, color):
+        if self.mode == "animate":
+            for node in nodes:
+                if self.superseded():
+                    return
+                self.parent.set_preview_color(node, color)
+                QApplication.processEvents()  # Force UI update
+            return
+
+        self.parent.view.setUpdatesEnabled(False)
+        for node in nodes:
+            self.parent.set_preview_color(node, color)
+        self.parent.view.setUpdatesEnabled(True)
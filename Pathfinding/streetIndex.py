@@ -0,0 +1,124 @@
+import numpy as np
+
+UNNAMED = 0  # Street id of cells without a street name
+
+
+# Cells of every street by interned street id, kept in step with the routing grid by an edit
+# listener, so questions about one street cost the street's size instead of a scan of the grid.
+# Each street's sorted cell array and bounding box are built on first use and dropped when one
+# of its cells moves to another street.
+class StreetIndex:
+    def __init__(self, grid):
+        self.grid = grid
+        self.street_ids = grid.street_ids.copy()  # Street of each cell as of the last edit seen
+        order = np.argsort(self.street_ids, kind='stable')
+        bounds = np.searchsorted(self.street_ids[order], np.arange(len(grid.street_names) + 1))
+        self.members = [set(order[start:end].tolist()) for start, end in zip(bounds[:-1], bounds[1:])]
+        self._cells = {}  # Street id -> sorted cell index array
+        self._boxes = {}  # Street id -> (first row, first col, last row, last col)
+        self.names_listeners = []  # Called with no arguments when a street gains its first cell or loses its last
+        grid.edit_listeners.append(self.on_edit)
+
+    # Moves edited cells between streets. Whole-grid edits are diffed against the last copy.
+    def on_edit(self, index):
+        if index is None:
+            cells = np.flatnonzero(self.street_ids != self.grid.street_ids)
+        else:
+            cells = np.atleast_1d(index)
+            cells = cells[self.street_ids[cells] != self.grid.street_ids[cells]]
+        if cells.size == 0:
+            return
+        old_ids = self.street_ids[cells]
+        new_ids = self.grid.street_ids[cells]
+        while len(self.members) < len(self.grid.street_names):
+            self.members.append(set())
+        streets = set(old_ids.tolist()) | set(new_ids.tolist())
+        was_empty = {street_id: not self.members[street_id] for street_id in streets}
+        for cell, old_id, new_id in zip(cells.tolist(), old_ids.tolist(), new_ids.tolist()):
+            self.members[old_id].discard(cell)
+            self.members[new_id].add(cell)
+        for street_id in streets:
+            self._cells.pop(street_id, None)
+            self._boxes.pop(street_id, None)
+        self.street_ids[cells] = new_ids
+        if any(was_empty[street_id] != (not self.members[street_id]) for street_id in streets):
+            for listener in self.names_listeners:
+                listener()
+
+    def street_id(self, name):
+        return self.grid.street_lookup.get(name)
+
+    # Named streets that still have cells, in the order they were first seen
+    def names(self):
+        return [self.grid.street_names[street_id] for street_id, cells in enumerate(self.members) if cells and street_id != UNNAMED]
+
+    def cells(self, name):
+        street_id = self.street_id(name)
+        if street_id is None or street_id >= len(self.members):
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells.get(street_id)
+        if cells is None:
+            cells = self._cells[street_id] = np.array(sorted(self.members[street_id]), dtype=np.int64)
+        return cells
+
+    # (first row, first col, last row, last col) of the street, or None if it has no cells
+    def bbox(self, name):
+        street_id = self.street_id(name)
+        box = self._boxes.get(street_id)
+        if box is None:
+            cells = self.cells(name)
+            if cells.size == 0:
+                return None
+            rows, cols = np.divmod(cells, self.grid.cols)
+            box = self._boxes[street_id] = (int(rows.min()), int(cols.min()), int(rows.max()), int(cols.max()))
+        return box
+
+    # Length in cells along the street's longer axis, counting each row or column it covers once,
+    # so the street's width and any gaps don't add to it
+    def length(self, name):
+        box = self.bbox(name)
+        if box is None:
+            return 0
+        rows, cols = np.divmod(self.cells(name), self.grid.cols)
+        first_row, first_col, last_row, last_col = box
+        return int(np.unique(cols if last_col - first_col >= last_row - first_row else rows).size)
+
+    def lengths(self):
+        return {name: self.length(name) for name in self.names()}
+
+    # Other named streets touching this one, each with the cells of this street that border it
+    def intersections(self, name):
+        cells = self.cells(name)
+        street_id = self.street_id(name)
+        grid = self.grid
+        rows, cols = np.divmod(cells, grid.cols)
+        found = {}
+        for inside, step in ((rows < grid.rows - 1, grid.cols), (rows > 0, -grid.cols), (cols < grid.cols - 1, 1), (cols > 0, -1)):
+            neighbor_ids = self.street_ids[cells[inside] + step]
+            crossing = (neighbor_ids != street_id) & (neighbor_ids != UNNAMED)
+            for other_id, cell in zip(neighbor_ids[crossing].tolist(), cells[inside][crossing].tolist()):
+                found.setdefault(other_id, set()).add(cell)
+        return {grid.street_names[other_id]: np.array(sorted(border), dtype=np.int64) for other_id, border in found.items()}
+
+    # Every pair of named streets that touch, as (name, name) sorted within and across pairs
+    def intersection_pairs(self):
+        grid = self.grid
+        ids = self.street_ids.reshape(grid.rows, grid.cols)
+        pairs = [np.stack([ids[:-1, :].ravel(), ids[1:, :].ravel()], axis=1),
+                 np.stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()], axis=1)]
+        pairs = np.sort(np.concatenate(pairs), axis=1)
+        pairs = np.unique(pairs[(pairs[:, 0] != pairs[:, 1]) & (pairs[:, 0] != UNNAMED)], axis=0)
+        return sorted((grid.street_names[first], grid.street_names[second]) for first, second in pairs.tolist())
+
+    # Bulk edits go through the grid so every listener (caches, cost profiles, this index) sees them
+    def rename(self, name, new_name):
+        cells = self.cells(name)
+        if cells.size:
+            self.grid.set_streets(cells, new_name)
+        return cells.size
+
+    def set_cost(self, name, cost):
+        cells = self.cells(name)
+        if cells.size:
+            self.grid.set_costs(cost, cells)
+        return cells.size
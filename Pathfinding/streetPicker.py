@@ -0,0 +1,94 @@
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+
+# Street-wide tools over the parent's StreetIndex: highlight, rename and re-cost a whole street
+class StreetPicker(QWidget):
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+        # Dropdown Box
+        self.street_selector = QComboBox()
+        self.street_selector.setEditable(False)
+        self.street_selector.currentTextChanged.connect(self.show_street_info)
+
+        self.info_label = QLabel("")
+        self.info_label.setWordWrap(True)
+
+        self.highlight_button = QPushButton("Highlight Street")
+        self.highlight_button.clicked.connect(self.highlight)
+
+        # Rename and cost inputs
+        self.name_input = QLineEdit()
+        self.name_input.setPlaceholderText("New street name")
+        self.rename_button = QPushButton("Rename Street")
+        self.rename_button.clicked.connect(self.rename)
+
+        self.cost_input = QLineEdit()
+        self.cost_input.setPlaceholderText("New cost")
+        self.cost_button = QPushButton("Set Street Cost")
+        self.cost_button.clicked.connect(self.set_cost)
+
+        # Layout Setup
+        self.layout = QVBoxLayout(self)
+        self.layout.addWidget(QLabel("Street:"))
+        self.layout.addWidget(self.street_selector)
+        self.layout.addWidget(self.info_label)
+        self.layout.addWidget(self.highlight_button)
+        self.layout.addWidget(self.name_input)
+        self.layout.addWidget(self.rename_button)
+        self.layout.addWidget(self.cost_input)
+        self.layout.addWidget(self.cost_button)
+
+        self.update_list()
+
+    # Updates the dropdown list with the grid's street names
+    def update_list(self):
+        current = self.street_selector.currentText()
+        self.street_selector.blockSignals(True)
+        self.street_selector.clear()
+        self.street_selector.addItems(self.parent.street_index.names())
+        self.street_selector.setCurrentText(current)
+        self.street_selector.blockSignals(False)
+        self.show_street_info(self.street_selector.currentText())
+
+    def show_street_info(self, name):
+        index = self.parent.street_index
+        box = index.bbox(name)
+        if box is None:
+            self.info_label.setText("")
+            return
+        crossing = ", ".join(sorted(index.intersections(name))) or "none"
+        self.info_label.setText(f"{index.cells(name).size} cells, length {index.length(name)}, rows {box[0]}-{box[2]}, cols {box[1]}-{box[3]}\n"
+                                f"Crosses: {crossing}")
+
+    def highlight(self):
+        name = self.street_selector.currentText()
+        if not name:
+            return  # "" is the unnamed street, i.e. every building and barrier
+        self.parent.real_color()
+        self.parent.highlight_cells(self.parent.street_index.cells(name), self.parent.color_map['open'])
+
+    def rename(self):
+        name = self.street_selector.currentText()
+        new_name = self.name_input.text().strip()
+        if not name or not new_name:
+            return
+        renamed = self.parent.street_index.rename(name, new_name)
+        print(f"Renamed {renamed} cells of {name} to {new_name}")
+        self.update_list()
+        self.street_selector.setCurrentText(new_name)
+
+    def set_cost(self):
+        name = self.street_selector.currentText()
+        if not name:
+            return
+        try:
+            cost = float(self.cost_input.text())
+        except ValueError:
+            print("Street cost must be a number")
+            return
+        changed = self.parent.street_index.set_cost(name, cost)
+        print(f"Set the cost of {changed} cells of {name} to {cost}")